@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..corpus import CorpusStore
+
+
+# positions in the list of activities, one concatenated series per column and length of each series
+RaggedBatch = Tuple[np.ndarray, List[np.ndarray], np.ndarray]
+
+
+def ragged_rows(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Rows of every `[start, stop)` range, one after another"""
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+
+
+def pack_frames(frames: List[pd.DataFrame], names: Sequence[Optional[str]]) -> RaggedBatch:
+    """Pack the columns `names` of the dataframes recording all of them into one ragged batch"""
+    positions = [i for i, df in enumerate(frames) if all(_n in df.columns for _n in names)]
+    values = [
+        np.concatenate([frames[i][name].to_numpy(dtype=np.float64) for i in positions] or [np.empty(0)])
+        for name in names
+    ]
+    return (
+        np.array(positions, dtype=np.int64), values,
+        np.array([len(frames[i]) for i in positions], dtype=np.int64),
+    )
+
+
+def pack_corpus(corpus: CorpusStore, activity_ids: Sequence[str], names: Sequence[Optional[str]]) -> RaggedBatch:
+    """Pack the columns `names` of the corpus activities recording all of them into one ragged batch"""
+    positions = np.array([
+        i for i, _id in enumerate(activity_ids)
+        if all(_n in corpus.activities[_id]["columns"] for _n in names)
+    ], dtype=np.int64)
+    starts, stops = corpus.bounds([activity_ids[i] for i in positions])
+    rows = ragged_rows(starts, stops)
+    values = [corpus.column(name)[rows] if len(positions) else np.empty(0) for name in names]
+    return positions, values, stops - starts
+
+
+def activity_columns(activity_ids: Sequence[str], start_times: Sequence, positions: np.ndarray) -> Dict[str, Any]:
+    """Activity id, start time and position columns of the activities of a ragged batch"""
+    return {
+        "activity_id": np.asarray(activity_ids, dtype=object)[positions],
+        "start_time": pd.to_datetime(pd.Series(start_times).iloc[positions].to_numpy()),
+        "position": positions,
+    }
+
+
+def in_activity_order(tables: List[pd.DataFrame], columns: Sequence[str]) -> pd.DataFrame:
+    """Concatenate per batch tables in the order of the activities, dropping the position column"""
+    if not tables:
+        return pd.DataFrame(columns=list(columns))
+    df = pd.concat(tables, ignore_index=True)
+    return df.sort_values("position", kind="stable").drop(columns="position").reset_index(drop=True)
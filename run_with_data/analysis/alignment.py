@@ -0,0 +1,296 @@
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..client import BaseClient
+from ..corpus import CorpusStore
+from ..schema.run_activity import RunActivity
+from ._ragged import activity_columns, in_activity_order, pack_corpus, pack_frames
+from .training_load import power_columns
+
+
+# z score of the 95% limits of agreement
+LOA_Z = 1.96
+
+# agreement columns, per activity and pair of power sources
+STATISTICS = ("n", "bias", "sd", "loa_lower", "loa_upper", "correlation")
+
+
+def ragged_lags(a: np.ndarray, b: np.ndarray, lengths: np.ndarray, max_lag: int = 30) -> np.ndarray:
+    """
+    Estimate the lag of `b` behind `a` for every series of a ragged batch with FFT cross-correlation
+
+    Series are mean-centered (NaN then counts as the mean) and padded to a power of two of
+    at least `length + max_lag` samples so lags up to `max_lag` don't wrap around. Series
+    with the same padded length go through one 2D FFT, so a whole history costs
+    O(n log n). The correlation at each lag is divided by the number of overlapping samples.
+
+    Args:
+        a (np.ndarray): Concatenated reference series at 1 Hz
+        b (np.ndarray): Concatenated series to align, same layout as `a`
+        lengths (np.ndarray): Length of each series, summing to `len(a)`
+        max_lag (int): Largest lag searched, in samples (seconds) either way
+
+    Returns:
+        np.ndarray: Lag of each series, positive when `b[t + lag]` matches `a[t]`,
+            0 for series without samples
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(len(segments)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    def centered(values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.bincount(segments, np.where(valid, values, 0.), len(lengths)) / np.bincount(
+                segments, valid, len(lengths)
+            )
+        return np.where(valid, values - means[segments], 0.)
+
+    a, b = centered(a), centered(b)
+    lags = np.arange(-max_lag, max_lag + 1)
+    result = np.zeros(len(lengths), dtype=np.int64)
+    nfft = 1 << np.ceil(np.log2(np.maximum(lengths + max_lag, 1))).astype(np.int64)
+    for size in np.unique(nfft[lengths > 0]):
+        group = np.flatnonzero((nfft == size) & (lengths > 0))
+        rows = np.full(len(lengths), -1)
+        rows[group] = np.arange(len(group))
+        in_group = rows[segments] >= 0
+        padded_a = np.zeros((len(group), size))
+        padded_b = np.zeros((len(group), size))
+        padded_a[rows[segments[in_group]], offsets[in_group]] = a[in_group]
+        padded_b[rows[segments[in_group]], offsets[in_group]] = b[in_group]
+
+        # xcorr[k] = sum_t a[t] * b[t + k], negative lags at the end
+        xcorr = np.fft.irfft(np.conj(np.fft.rfft(padded_a)) * np.fft.rfft(padded_b), n=size)
+        overlap = lengths[group, None] - np.abs(lags)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(overlap > 0, xcorr[:, lags % size] / overlap, -np.inf)
+        result[group] = lags[np.argmax(scores, axis=1)]
+    return result
+
+
+def shift(values: np.ndarray, lag: int) -> np.ndarray:
+    """Return `values[t + lag]` at every `t`, NaN past either end"""
+    values = np.asarray(values, dtype=np.float64)
+    shifted = np.full(len(values), np.nan)
+    if lag >= 0:
+        shifted[:max(len(values) - lag, 0)] = values[lag:]
+    else:
+        shifted[-lag:] = values[:lag]
+    return shifted
+
+
+def _ragged_sums(
+    a: np.ndarray,
+    b: np.ndarray,
+    lengths: np.ndarray,
+    lags: np.ndarray,
+    min_power: float,
+) -> Dict[str, np.ndarray]:
+    # shift b by the lag of its series, within the series, then sum over the paired samples
+    # (sums rather than statistics, so activities can be pooled exactly)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(len(segments)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    inside = (offsets + lags[segments] >= 0) & (offsets + lags[segments] < lengths[segments])
+    rows = np.where(inside, np.arange(len(segments)) + lags[segments], 0)
+    b = np.where(inside, np.asarray(b, dtype=np.float64)[rows], np.nan)
+    a = np.asarray(a, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        # also drops pauses, recorded as 0 by every source
+        paired = (a > min_power) & (b > min_power)
+    a, b, segments = a[paired], b[paired], segments[paired]
+    d = b - a
+    terms = {"n": None, "a": a, "b": b, "d": d, "dd": d * d, "aa": a * a, "bb": b * b, "ab": a * b}
+    return {name: np.bincount(segments, weights, len(lengths)) for name, weights in terms.items()}
+
+
+def _statistics(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    n = sums["n"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bias = sums["d"] / n
+        sd = np.sqrt(np.maximum(sums["dd"] - n * bias ** 2, 0.) / (n - 1))
+        correlation = (n * sums["ab"] - sums["a"] * sums["b"]) / np.sqrt(
+            (n * sums["aa"] - sums["a"] ** 2) * (n * sums["bb"] - sums["b"] ** 2)
+        )
+    return {
+        "n": n.astype(np.int64),
+        "bias": bias,
+        "sd": sd,
+        "loa_lower": bias - LOA_Z * sd,
+        "loa_upper": bias + LOA_Z * sd,
+        "correlation": correlation,
+    }
+
+
+def agreement(a: np.ndarray, b: np.ndarray, min_power: float = 0.) -> Dict[str, float]:
+    """
+    Bland-Altman agreement of two aligned power series
+
+    Args:
+        a (np.ndarray): Reference power
+        b (np.ndarray): Compared power
+        min_power (float): Only samples where both series are above it are compared
+
+    Returns:
+        Dict[str, float]: Number of paired samples `n`, `bias` (mean of `b - a`), `sd` of the
+            differences, 95% limits of agreement `loa_lower` and `loa_upper` and the Pearson `correlation`
+    """
+    sums = _ragged_sums(a, b, np.array([len(a)]), np.zeros(1, dtype=np.int64), min_power)
+    return {name: value[0].item() for name, value in _statistics(sums).items()}
+
+
+def align_columns(
+    df: pd.DataFrame,
+    reference: str,
+    columns: Optional[Sequence[str]] = None,
+    max_lag: int = 30,
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Realign columns of a 1 Hz dataframe (e.g. from `to_df(client, resample="1s")`) on a reference column
+
+    Args:
+        df (pd.DataFrame): Dataframe resampled at 1 Hz
+        reference (str): Column the others are aligned to
+        columns (Optional[Sequence[str]]): Columns to realign, defaults to the other power columns
+        max_lag (int): Largest lag searched, in seconds either way
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, int]]: Copy of the dataframe with the columns shifted
+            (NaN past the ends) and the lag of each column in seconds
+    """
+    if columns is None:
+        columns = [_c for _c in power_columns().values() if _c in df.columns and _c != reference]
+    df = df.copy()
+    lags = {}
+    for column in columns:
+        lag = ragged_lags(
+            df[reference].to_numpy(dtype=np.float64), df[column].to_numpy(dtype=np.float64), [len(df)], max_lag
+        )[0]
+        lags[column] = lag.item()
+        df[column] = shift(df[column].to_numpy(dtype=np.float64), lag)
+    return df, lags
+
+
+def _pairs(sources: Optional[Sequence[str]], pairs: Optional[Sequence[Tuple[str, str]]]) -> List[Tuple[str, str]]:
+    if pairs is not None:
+        return list(pairs)
+    return list(combinations(sources or list(power_columns()), 2))
+
+
+def _tables(
+    activity_ids: Sequence[str],
+    start_times: Sequence,
+    batches: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]],
+    max_lag: int,
+    min_power: float,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # batches: (reference, other) -> (positions in activity_ids, reference power, other power, lengths)
+    per_activity, corpus = [], []
+    for (reference, other), (positions, a, b, lengths) in batches.items():
+        if not len(positions):
+            continue
+        lags = ragged_lags(a, b, lengths, max_lag)
+        sums = _ragged_sums(a, b, lengths, lags, min_power)
+        per_activity.append(pd.DataFrame({
+            **activity_columns(activity_ids, start_times, positions),
+            "reference": reference,
+            "other": other,
+            "lag": lags,
+            **_statistics(sums),
+        }))
+        pooled = _statistics({name: np.array([values.sum()]) for name, values in sums.items()})
+        corpus.append({
+            "reference": reference,
+            "other": other,
+            "n_activities": len(positions),
+            "median_lag": np.median(lags),
+            **{name: value[0] for name, value in pooled.items()},
+        })
+
+    return (
+        in_activity_order(per_activity, ["activity_id", "start_time", "reference", "other", "lag", *STATISTICS]),
+        pd.DataFrame(corpus, columns=["reference", "other", "n_activities", "median_lag", *STATISTICS]),
+    )
+
+
+def power_agreement(
+    activities: List[RunActivity],
+    client: Optional[BaseClient],
+    sources: Optional[Sequence[str]] = None,
+    pairs: Optional[Sequence[Tuple[str, str]]] = None,
+    max_lag: int = 30,
+    min_power: float = 0.,
+    frames: Optional[List[pd.DataFrame]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Align pairs of power sources and compare them, per activity and over all activities
+
+    For every pair, activities recording both sources are packed into one ragged batch:
+    the lag of the second source is estimated with `ragged_lags`, the second source is
+    shifted by it, then the agreement statistics (see `agreement`) are computed per activity
+    and pooled over the batch.
+
+    Args:
+        activities (List[RunActivity]): Activities to compare
+        client (Optional[BaseClient]): Client loading the 1 Hz dataframes, unused with `frames`
+        sources (Optional[Sequence[str]]): Power sources ("garmin", "stryd", "runpowermodel")
+            compared two by two, defaults to all of them
+        pairs (Optional[Sequence[Tuple[str, str]]]): `(reference, other)` sources to compare
+            instead of every pair of `sources`
+        max_lag (int): Largest lag searched, in seconds either way
+        min_power (float): Only samples where both sources are above it are compared
+        frames (Optional[List[pd.DataFrame]]): Dataframes of the activities resampled at 1 Hz
+            (e.g. from `batch.load_frames`), loaded with `to_df` if not given
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: One row per activity and pair (lag in seconds,
+            number of paired samples, bias, sd, limits of agreement, correlation), in the
+            order of `activities`, and one row per pair pooled over all activities
+    """
+    if frames is None:
+        frames = [activity.to_df(client, resample="1s") for activity in activities]
+    columns = power_columns()
+    batches = {}
+    for reference, other in _pairs(sources, pairs):
+        positions, (a, b), lengths = pack_frames(frames, [columns.get(reference), columns.get(other)])
+        batches[(reference, other)] = (positions, a, b, lengths)
+    return _tables(
+        [activity.activity_id for activity in activities],
+        [activity.start_time for activity in activities],
+        batches, max_lag, min_power,
+    )
+
+
+def corpus_power_agreement(
+    corpus: CorpusStore,
+    activity_ids: Optional[Sequence[str]] = None,
+    sources: Optional[Sequence[str]] = None,
+    pairs: Optional[Sequence[Tuple[str, str]]] = None,
+    max_lag: int = 30,
+    min_power: float = 0.,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Align and compare power sources over the activities of a 1 Hz `CorpusStore`, see `power_agreement`
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: Same tables as `power_agreement`
+    """
+    if corpus.resample != "1s":
+        raise ValueError(f"Alignment needs a corpus resampled at 1s, not {corpus.resample}")
+    activity_ids = corpus.activity_ids if activity_ids is None else list(activity_ids)
+    columns = power_columns()
+    batches = {}
+    for reference, other in _pairs(sources, pairs):
+        names = [columns.get(reference), columns.get(other)]
+        positions, (a, b), lengths = pack_corpus(corpus, activity_ids, names)
+        batches[(reference, other)] = (positions, a, b, lengths)
+    return _tables(
+        activity_ids,
+        [corpus.activities[_id]["start_time"] for _id in activity_ids],
+        batches, max_lag, min_power,
+    )
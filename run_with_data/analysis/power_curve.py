@@ -0,0 +1,159 @@
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..client import BaseClient
+from ..client.cache import atomic_write
+from ..schema.run_activity import RunActivity
+
+
+def mean_max_curve(power: np.ndarray, max_duration: Optional[int] = None) -> np.ndarray:
+    """
+    Compute the mean-maximal power curve of a 1 Hz power series
+
+    Window sums come from a single cumulative sum, so every duration costs one vectorized
+    pass instead of a rolling window.
+
+    Args:
+        power (np.ndarray): Power samples at 1 Hz (e.g. from `to_df(client, resample="1s")`),
+            NaN is treated as 0
+        max_duration (Optional[int]): Longest duration in seconds, defaults to the series length
+
+    Returns:
+        np.ndarray: `curve[d - 1]` is the best average power over any `d` consecutive seconds
+    """
+    power = np.nan_to_num(np.asarray(power, dtype=np.float64))
+    n = len(power)
+    max_duration = n if max_duration is None else min(max_duration, n)
+
+    cumsum = np.concatenate([[0.], np.cumsum(power)])
+    curve = np.empty(max_duration)
+    for d in range(1, max_duration + 1):
+        curve[d - 1] = (cumsum[d:] - cumsum[:-d]).max() / d
+    return curve
+
+
+def _pad(curve: np.ndarray, length: int) -> np.ndarray:
+    return np.concatenate([curve, np.full(length - len(curve), np.nan)])
+
+
+class PowerCurveStore:
+    """
+    Per-activity mean-maximal power curves of one power column, persisted next to the detail cache.
+
+    Curves are computed once per activity. The all-time best curve is updated incrementally
+    as activities are added and rolling-window bests are built from the stored curves, so
+    history never has to be reloaded or recomputed.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        cache_dir: str = "~/.cache/garmin_activities",
+        max_duration: Optional[int] = None,
+    ) -> None:
+        self.column = column
+        self.max_duration = max_duration
+        slug = re.sub(r"[^a-z0-9]+", "_", column.lower()).strip("_")
+        self.curves_dir = os.path.join(os.path.expanduser(cache_dir), "curves", slug)
+        Path(self.curves_dir).mkdir(parents=True, exist_ok=True)
+
+        self.index_path = os.path.join(self.curves_dir, "index.json")
+        self.best_path = os.path.join(self.curves_dir, "best.npz")
+
+        # activity id -> start time (iso format)
+        self.activities: Dict[str, str] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.activities = json.load(f)
+
+        self.best = np.empty(0)
+        self.best_activity_ids = np.empty(0, dtype=str)
+        if os.path.exists(self.best_path):
+            with np.load(self.best_path, allow_pickle=False) as data:
+                self.best = data["best"]
+                self.best_activity_ids = data["activity_ids"]
+
+    def __contains__(self, activity_id: str) -> bool:
+        return activity_id in self.activities
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def _curve_path(self, activity_id: str) -> str:
+        return os.path.join(self.curves_dir, f"{activity_id}.npy")
+
+    def curve(self, activity_id: str) -> np.ndarray:
+        return np.load(self._curve_path(activity_id))
+
+    def add(self, activity_id: str, start_time: datetime, curve: np.ndarray, save: bool = True) -> None:
+        """Store the curve of an activity and merge it into the all-time best"""
+        atomic_write(self._curve_path(activity_id), lambda f: np.save(f, curve))
+        self.activities[activity_id] = start_time.isoformat()
+
+        length = max(len(self.best), len(curve))
+        best, curve = _pad(self.best, length), _pad(curve, length)
+        improved = ~np.isnan(curve) & (np.isnan(best) | (curve > best))
+        self.best = np.where(improved, curve, best)
+        self.best_activity_ids = np.where(
+            improved, activity_id, np.concatenate([
+                self.best_activity_ids,
+                np.full(length - len(self.best_activity_ids), "")
+            ])
+        )
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        data = json.dumps(self.activities)
+        atomic_write(self.index_path, lambda f: f.write(data.encode()))
+        atomic_write(
+            self.best_path,
+            lambda f: np.savez(f, best=self.best, activity_ids=self.best_activity_ids)
+        )
+
+    def update(self, activities: List[RunActivity], client: BaseClient) -> int:
+        """
+        Compute and store the curves of activities that are not stored yet
+
+        Activities without the power column are skipped (and checked again on the next update).
+
+        Returns:
+            int: Number of added activities
+        """
+        added = 0
+        for activity in activities:
+            if activity.activity_id in self:
+                continue
+            df = activity.to_df(client, resample="1s")
+            if self.column not in df.columns:
+                continue
+            curve = mean_max_curve(df[self.column].to_numpy(), self.max_duration)
+            self.add(activity.activity_id, activity.start_time, curve, save=False)
+            added += 1
+        if added:
+            self.save()
+        return added
+
+    def all_time_best(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the all-time best curve and the activity id holding each duration's best"""
+        return self.best, self.best_activity_ids
+
+    def rolling_best(self, days: int, end: Optional[datetime] = None) -> np.ndarray:
+        """Return the best curve over the activities of the `days` days before `end` (defaults to now)"""
+        end = end or datetime.now()
+        start = end - timedelta(days=days)
+        curves = [
+            self.curve(activity_id)
+            for activity_id, start_time in self.activities.items()
+            if start < datetime.fromisoformat(start_time) <= end
+        ]
+        if not curves:
+            return np.empty(0)
+        length = max(len(_c) for _c in curves)
+        return np.nanmax(np.stack([_pad(_c, length) for _c in curves]), axis=0)
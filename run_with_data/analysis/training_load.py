@@ -0,0 +1,220 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..client import BaseClient
+from ..corpus import CorpusStore
+from ..data_field import PROVIDER_REGISTRY
+from ..schema.activity_frame import POWER_METRIC_NAMES
+from ..schema.run_activity import RunActivity
+from ._ragged import activity_columns, in_activity_order, pack_corpus, pack_frames
+
+
+# summary columns, per activity and power source
+METRICS = (
+    "duration",
+    "average_power",
+    "max_rolling_power",
+    "normalized_power",
+    "intensity_factor",
+    "training_stress_score",
+)
+
+
+def power_columns() -> Dict[str, str]:
+    """Return the dataframe column (as named by `RunActivity.to_df`) of each power source"""
+    columns = {}
+    for provider in PROVIDER_REGISTRY.providers.values():
+        if provider.POWER_SOURCE is None:
+            continue
+        for metric in provider.metrics:
+            if metric.name.lower() in POWER_METRIC_NAMES:
+                name = f"Power - {metric.app_name}" if metric.name == "Power" else metric.name
+                columns.setdefault(provider.POWER_SOURCE, name)
+                break
+    return columns
+
+
+def _segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # sum of each consecutive segment, from a single cumulative sum (empty segments sum to 0)
+    cumsum = np.concatenate([[0.], np.cumsum(values)])
+    ends = np.cumsum(lengths)
+    return cumsum[ends] - cumsum[ends - lengths]
+
+
+def ragged_rolling_mean(values: np.ndarray, lengths: np.ndarray, window: int = 30) -> np.ndarray:
+    """
+    Trailing rolling mean over a ragged batch of 1 Hz series laid out one after another
+
+    Args:
+        values (np.ndarray): Concatenated series, NaN is treated as 0
+        lengths (np.ndarray): Length of each series, summing to `len(values)`
+        window (int): Window in samples (seconds)
+
+    Returns:
+        np.ndarray: Rolling mean aligned with `values`, NaN over the first `window - 1`
+            samples of each series so windows never span two activities
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    lengths = np.asarray(lengths, dtype=np.int64)
+    cumsum = np.concatenate([[0.], np.cumsum(values)])
+    ends = np.arange(1, len(values) + 1)
+    rolling = (cumsum[ends] - cumsum[np.maximum(ends - window, 0)]) / window
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rolling[ends - offsets < window] = np.nan
+    return rolling
+
+
+def load_metrics(
+    power: np.ndarray,
+    lengths: np.ndarray,
+    ftp: float,
+    window: int = 30,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute the load metrics of a ragged batch of 1 Hz power series in one vectorized pass
+
+    Normalized power is the fourth root of the mean of the fourth power of the `window`
+    seconds rolling power, intensity factor is normalized power over `ftp` and training
+    stress score is `hours * intensity_factor ** 2 * 100`.
+
+    Args:
+        power (np.ndarray): Concatenated power series at 1 Hz, NaN is treated as 0
+        lengths (np.ndarray): Length of each series, summing to `len(power)`
+        ftp (float): Functional threshold power, in the unit of `power`
+        window (int): Rolling window in seconds
+
+    Returns:
+        Dict[str, np.ndarray]: Each of `METRICS` per series, NaN for the rolling metrics
+            of series shorter than `window`
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    power = np.nan_to_num(np.asarray(power, dtype=np.float64))
+    rolling = ragged_rolling_mean(power, lengths, window)
+    valid = ~np.isnan(rolling)
+    n_valid = _segment_sums(valid, lengths)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = _segment_sums(power, lengths) / lengths
+        normalized = (_segment_sums(np.where(valid, rolling, 0.) ** 4, lengths) / n_valid) ** 0.25
+    normalized[n_valid == 0] = np.nan
+
+    # reduceat needs non-empty segments, series without rolling values only hold -inf
+    # so they can be merged into the previous segment
+    starts = np.cumsum(lengths) - lengths
+    has_rolling = n_valid > 0
+    max_rolling = np.full(len(lengths), np.nan)
+    if has_rolling.any():
+        max_rolling[has_rolling] = np.maximum.reduceat(np.where(valid, rolling, -np.inf), starts[has_rolling])
+
+    intensity = normalized / ftp
+    return {
+        "duration": lengths.astype(np.float64),
+        "average_power": average,
+        "max_rolling_power": max_rolling,
+        "normalized_power": normalized,
+        "intensity_factor": intensity,
+        "training_stress_score": lengths / 3600 * intensity ** 2 * 100,
+    }
+
+
+def _summary(
+    activity_ids: Sequence[str],
+    start_times: Sequence,
+    batches: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ftp: Union[float, Dict[str, float]],
+    window: int,
+) -> pd.DataFrame:
+    # batches: power source -> (positions in activity_ids, concatenated power, lengths)
+    tables = []
+    for source, (positions, power, lengths) in batches.items():
+        if not len(positions):
+            continue
+        metrics = load_metrics(power, lengths, ftp[source] if isinstance(ftp, dict) else ftp, window)
+        tables.append(pd.DataFrame({
+            **activity_columns(activity_ids, start_times, positions),
+            "power_source": source,
+            **metrics,
+        }))
+    return in_activity_order(tables, ["activity_id", "start_time", "power_source", *METRICS])
+
+
+def training_load(
+    activities: List[RunActivity],
+    client: Optional[BaseClient],
+    ftp: Union[float, Dict[str, float]],
+    sources: Optional[Sequence[str]] = None,
+    window: int = 30,
+    frames: Optional[List[pd.DataFrame]] = None,
+) -> pd.DataFrame:
+    """
+    Compute the load metrics of activities for every power source
+
+    The power of all activities is packed into one ragged batch per source, so a season
+    costs a few cumulative sums instead of a pandas rolling window per activity and column.
+
+    Args:
+        activities (List[RunActivity]): Activities to summarize
+        client (Optional[BaseClient]): Client loading the 1 Hz dataframes, unused with `frames`
+        ftp (Union[float, Dict[str, float]]): Functional threshold power, or one per power
+            source since sources don't agree on absolute power
+        sources (Optional[Sequence[str]]): Power sources ("garmin", "stryd", "runpowermodel"),
+            defaults to all of them
+        window (int): Rolling window in seconds
+        frames (Optional[List[pd.DataFrame]]): Dataframes of the activities resampled at 1 Hz
+            (e.g. from `batch.load_frames`), loaded with `to_df` if not given
+
+    Returns:
+        pd.DataFrame: One row per activity and recorded power source with the activity id,
+            start time, power source and `METRICS`, in the order of `activities`
+    """
+    if frames is None:
+        frames = [activity.to_df(client, resample="1s") for activity in activities]
+    columns = power_columns()
+    batches = {}
+    for source in sources or list(columns):
+        positions, (power,), lengths = pack_frames(frames, [columns.get(source)])
+        batches[source] = (positions, power, lengths)
+    return _summary(
+        [activity.activity_id for activity in activities],
+        [activity.start_time for activity in activities],
+        batches, ftp, window,
+    )
+
+
+def corpus_training_load(
+    corpus: CorpusStore,
+    ftp: Union[float, Dict[str, float]],
+    activity_ids: Optional[Sequence[str]] = None,
+    sources: Optional[Sequence[str]] = None,
+    window: int = 30,
+) -> pd.DataFrame:
+    """
+    Compute the load metrics of activities of a 1 Hz `CorpusStore`, see `training_load`
+
+    Power is gathered straight from the memory-mapped columns, no dataframe is built.
+
+    Args:
+        corpus (CorpusStore): Corpus resampled at "1s"
+        ftp (Union[float, Dict[str, float]]): Functional threshold power, or one per power source
+        activity_ids (Optional[Sequence[str]]): Activities to summarize, defaults to all of them
+        sources (Optional[Sequence[str]]): Power sources, defaults to all of them
+        window (int): Rolling window in seconds
+
+    Returns:
+        pd.DataFrame: Same table as `training_load`
+    """
+    if corpus.resample != "1s":
+        raise ValueError(f"Load metrics need a corpus resampled at 1s, not {corpus.resample}")
+    activity_ids = corpus.activity_ids if activity_ids is None else list(activity_ids)
+    columns = power_columns()
+    batches = {}
+    for source in sources or list(columns):
+        positions, (power,), lengths = pack_corpus(corpus, activity_ids, [columns.get(source)])
+        batches[source] = (positions, power, lengths)
+    return _summary(
+        activity_ids,
+        [corpus.activities[_id]["start_time"] for _id in activity_ids],
+        batches, ftp, window,
+    )
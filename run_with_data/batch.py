@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .client import BaseClient
+from .client.garmin import GarminClient
+from .client.local import CacheClient
+from .schema.run_activity import RunActivity
+
+
+# one client per worker process
+_WORKER_CLIENTS: Dict[Tuple[str, bool], BaseClient] = {}
+
+
+def _load_frame(
+    activity: RunActivity,
+    cache_dir: str,
+    resample: Optional[str],
+    fetch_missing: bool = False,
+) -> pd.DataFrame:
+    client = _WORKER_CLIENTS.get((cache_dir, fetch_missing))
+    if client is None:
+        # a lazy Garmin client only logs in (with the saved session tokens) on a cache miss
+        client = GarminClient(cache_dir, lazy_login=True) if fetch_missing else CacheClient(cache_dir)
+        _WORKER_CLIENTS[(cache_dir, fetch_missing)] = client
+    # frames are sent back to the parent, don't keep a copy in the worker's frame cache
+    return activity.to_df(client, resample=resample, use_cache=False)
+
+
+def _iter_frames(
+    activities: List[RunActivity],
+    cache_dir: str,
+    resample: Optional[str],
+    workers: Optional[int],
+    fetch_missing: bool,
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Position in `activities` and dataframe of every activity, in completion order"""
+    cache_dir = os.path.expanduser(cache_dir)
+    workers = workers or os.cpu_count()
+
+    if workers == 1:
+        for i, activity in enumerate(activities):
+            yield i, _load_frame(activity, cache_dir, resample, fetch_missing)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _load_frame, activity.model_copy(update={"frame": None}), cache_dir, resample, fetch_missing
+            ): i
+            for i, activity in enumerate(activities)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def iter_frames(
+    activities: List[RunActivity],
+    cache_dir: str = "~/.cache/garmin_activities",
+    resample: Optional[str] = "1s",
+    workers: Optional[int] = None,
+    fetch_missing: bool = False,
+) -> Iterator[Tuple[RunActivity, pd.DataFrame]]:
+    """
+    Build the dataframes of cached activities on a process pool, yielding them as they complete
+
+    Workers read straight from the detail cache, so the details must have been fetched
+    beforehand (e.g. with `GarminClient.prefetch_details`), unless `fetch_missing` is set.
+
+    Args:
+        activities (List[RunActivity]): Activities to load
+        cache_dir (str): Cache directory of the `GarminClient`
+        resample (Optional[str]): Resample frequency passed to `RunActivity.to_df`
+        workers (Optional[int]): Number of worker processes, defaults to the number of CPUs.
+            With 1 the frames are built in the current process.
+        fetch_missing (bool): Download uncached details from Garmin Connect. Workers log in
+            on their first cache miss with the session tokens saved by an earlier login.
+
+    Yields:
+        Tuple[RunActivity, pd.DataFrame]: Activity and its dataframe, in completion order
+    """
+    for i, df in _iter_frames(activities, cache_dir, resample, workers, fetch_missing):
+        yield activities[i], df
+
+
+def load_frames(
+    activities: List[RunActivity],
+    cache_dir: str = "~/.cache/garmin_activities",
+    resample: Optional[str] = "1s",
+    workers: Optional[int] = None,
+    fetch_missing: bool = False,
+) -> List[pd.DataFrame]:
+    """Build the dataframes of cached activities on a process pool, in the order of `activities`"""
+    frames: List[Optional[pd.DataFrame]] = [None] * len(activities)
+    # results are matched by position, the same activity may be listed more than once
+    for i, df in _iter_frames(activities, cache_dir, resample, workers, fetch_missing):
+        frames[i] = df
+    return frames
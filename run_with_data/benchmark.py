@@ -0,0 +1,383 @@
+"""
+Offline benchmarks for the hot paths of the package.
+
+Run with:
+
+    python -m run_with_data.benchmark [--json results.json] [--hours 0.5 1 6 24] [--batches 10 100 1000]
+"""
+import argparse
+import json
+import platform
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .analysis.alignment import power_agreement
+from .analysis.training_load import training_load
+from .batch import load_frames
+from .client.cache import DetailCache, details_to_array, read_details_json
+from .client.local import CacheClient
+from .client.synthetic import SyntheticClient
+from .data_field.dem import SRTM_VOID, DEMTiles
+from .data_field.elevation import get_elevation_data
+from .schema.frame_cache import FRAME_CACHE
+from .schema.run_activity import garmin_resample
+from .schema.run_metric import format_pace, mps_to_pace, ms_to_pace
+from .utils import split_df
+
+
+def synthetic_activity_df(hours: float, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a Garmin-like activity dataframe with irregular sampling and pauses.
+
+    Args:
+        hours (float): Activity duration in hours
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Dataframe indexed by timestamp with Speed, Heart Rate and Power columns
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(hours * 3600 / 2)
+
+    # 1-3 seconds between samples with an occasional pause of 30-120 seconds
+    steps = rng.integers(1, 4, size=n_samples)
+    pauses = rng.random(n_samples) < 0.002
+    steps[pauses] = rng.integers(30, 121, size=pauses.sum())
+    seconds = np.concatenate([[0], np.cumsum(steps[1:])])
+
+    index = pd.to_datetime(1_700_000_000 + seconds, unit="s")
+    return pd.DataFrame(
+        {
+            "Speed": rng.normal(3.2, 0.4, n_samples).clip(0),
+            "Heart Rate": rng.normal(150, 10, n_samples).round(),
+            "Power": rng.normal(260, 30, n_samples).round(),
+        },
+        index=index,
+    )
+
+
+def _reference_garmin_resample(df: pd.DataFrame, target_freq: str = '1s', break_threshold: int = 10) -> pd.DataFrame:
+    """Original O(n*m) implementation of `garmin_resample`, kept to check equivalence"""
+    df = df.copy()
+    full_range = pd.date_range(start=df.index.min(), end=df.index.max(), freq=target_freq)
+    resampled = df.reindex(full_range)
+
+    original_timestamps = df.index
+    time_diffs = []
+    for idx in resampled.index:
+        prev_timestamps = original_timestamps[original_timestamps <= idx]
+        if len(prev_timestamps) > 0:
+            time_diffs.append((idx - prev_timestamps[-1]).total_seconds())
+        else:
+            time_diffs.append(0)
+
+    break_mask = np.array(time_diffs) > break_threshold
+    resampled.loc[break_mask] = 0
+    resampled = resampled.ffill()
+    return resampled.fillna(0.)
+
+
+def _timeit(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Return the best wall time of `repeat` runs in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_resample_equivalence(hours: float = 0.5) -> None:
+    """Assert that `garmin_resample` matches the original implementation"""
+    df = synthetic_activity_df(hours)
+    pd.testing.assert_frame_equal(garmin_resample(df), _reference_garmin_resample(df))
+
+
+def check_dem_sampling() -> None:
+    """
+    Assert that `DEMTiles` interpolates synthetic tiles exactly, through the "dem" elevation backend
+
+    Two adjacent tiles hold a plane, which bilinear interpolation reproduces exactly, including
+    at tile edges and corners (5x5 tiles keep the plane integral at every sample). A void sample makes the cells around it NaN, as does a missing tile.
+    """
+    def plane(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        return 1000 * (lats - 13) + 500 * (lngs - 100) + 10
+
+    size = 5
+    step = 1 / (size - 1)
+    with tempfile.TemporaryDirectory() as dem_dir:
+        for lng in (100, 101):
+            # row 0 is the north edge
+            lats, lngs = np.meshgrid(14 - np.arange(size) * step, lng + np.arange(size) * step, indexing="ij")
+            tile = np.rint(plane(lats, lngs)).astype(">i2")
+            if lng == 101:
+                tile[1, 1] = SRTM_VOID
+            tile.tofile(os.path.join(dem_dir, DEMTiles.tile_name(13, lng)))
+
+        rng = np.random.default_rng(0)
+        lats = np.concatenate([rng.uniform(13, 14, 1000), [13., 13., 13.999999, 13.5, 13.5]])
+        lngs = np.concatenate([rng.uniform(100, 101, 1000), [100., 100.999999, 100.999999, 101., 101.999999]])
+        sampled = np.array(get_elevation_data(list(zip(lats, lngs)), backend="dem", dem_dir=dem_dir))
+        np.testing.assert_allclose(sampled, plane(lats, lngs), atol=1e-6)
+
+        # samples in the cells touching the void sample of the second tile, and in a missing tile
+        void = DEMTiles(dem_dir).sample(
+            [14 - step / 2, 14 - 1.5 * step, 13.1, 12.5],
+            [101 + step / 2, 101 + 1.5 * step, 101.9, 100.5],
+        )
+        if not (np.isnan(void[[0, 1, 3]]).all() and np.isclose(void[2], plane(13.1, 101.9))):
+            raise AssertionError(f"DEMTiles does not handle void samples or missing tiles: {void}")
+
+
+def check_frame_cache_offset() -> None:
+    """
+    Assert that memoized frames of the same activity are not shared across local time offsets
+
+    Two `RunActivity` instances with the same id and details but different `start_time_gmt`
+    must each get their own index, even when the first frame is already in `FRAME_CACHE`.
+    """
+    client = SyntheticClient(1, duration=(600, 600), seed=1)
+    activity = client.get_run_activities(1)[0]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = DetailCache(os.path.join(cache_dir, "details"))
+        cache.write_arrays(activity.activity_id, *client.get_activity_arrays(activity.activity_id))
+        cache_client = CacheClient(cache_dir)
+        shifted = activity.model_copy(update={
+            "frame": None,
+            "start_time_gmt": activity.start_time - pd.Timedelta(hours=3).to_pytimedelta(),
+        })
+        utc = activity.model_copy(update={"frame": None, "start_time_gmt": None})
+        FRAME_CACHE.invalidate(activity.activity_id)
+        frames = [_a.to_df(cache_client, resample="1s") for _a in (activity, shifted, utc, shifted)]
+        FRAME_CACHE.invalidate(activity.activity_id)
+
+    offsets = [df.index[0] - frames[2].index[0] for df in frames]
+    expected = [
+        pd.Timedelta(activity.start_time - activity.start_time_gmt), pd.Timedelta(hours=3),
+        pd.Timedelta(0), pd.Timedelta(hours=3),
+    ]
+    if offsets != expected:
+        raise AssertionError(f"FRAME_CACHE mixes up local time offsets: {offsets} != {expected}")
+
+
+def _peak_memory(fn: Callable[[], object]) -> int:
+    """Return the peak memory allocated while running `fn` in bytes"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _legacy_load_json(path: str) -> np.ndarray:
+    """Original detail parsing: decode the whole payload then build the array from a list of rows"""
+    with open(path, "r") as f:
+        details = json.load(f)
+    return np.array([t["metrics"] for t in details["activityDetailMetrics"]])
+
+
+def bench_details_memory(hours: float = 24) -> Dict[str, int]:
+    """Compare the peak memory of parsing a detail payload with the legacy and streaming paths"""
+    client = SyntheticClient(duration=(hours * 3600, hours * 3600))
+    details = client.get_activity_details(client.activity_id(0))
+    fd, path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(details, f)
+        return {
+            f"memory/details_json/legacy/{hours}h": _peak_memory(lambda: _legacy_load_json(path)),
+            f"memory/details_json/streaming/{hours}h": _peak_memory(lambda: read_details_json(path)),
+            f"memory/details_dict/legacy/{hours}h": _peak_memory(
+                lambda: np.array([t["metrics"] for t in details["activityDetailMetrics"]])
+            ),
+            f"memory/details_dict/streaming/{hours}h": _peak_memory(lambda: details_to_array(details)),
+        }
+    finally:
+        os.remove(path)
+
+
+def check_import_time(
+    module: str = "run_with_data.client.garmin",
+    budget: float = 1.0,
+    forbidden: Sequence[str] = ("matplotlib", "garminconnect"),
+) -> float:
+    """
+    Import `module` in a fresh interpreter and fail if it is slow or pulls in lazy dependencies
+
+    Args:
+        module (str): Module to import
+        budget (float): Maximum import time in seconds
+        forbidden (Sequence[str]): Modules that must not be imported as a side effect
+
+    Returns:
+        float: Import time in seconds
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {tuple(forbidden)!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    seconds, imported = float(output[0]), output[1] if len(output) > 1 else ""
+    if imported:
+        raise RuntimeError(f"Importing {module} also imported {imported}")
+    if seconds > budget:
+        raise RuntimeError(f"Importing {module} took {seconds:.3f}s, over the {budget:.3f}s budget")
+    return seconds
+
+
+def bench_pace(n: int = 1_000_000) -> Dict[str, float]:
+    """Check `mps_to_pace`/`format_pace` against `ms_to_pace` and time both over `n` speeds"""
+    speeds = np.random.default_rng(0).uniform(-0.5, 6., n)
+    speeds[::1000] = 0.
+
+    def vectorized():
+        return format_pace(*mps_to_pace(speeds))
+
+    def scalar():
+        return [ms_to_pace(speed) for speed in speeds]
+
+    if vectorized().tolist() != scalar():
+        raise AssertionError("mps_to_pace does not match ms_to_pace")
+    return {
+        f"pace/vectorized/{n}": _timeit(lambda: mps_to_pace(speeds)),
+        f"pace/vectorized_format/{n}": _timeit(vectorized, repeat=1),
+        f"pace/scalar/{n}": _timeit(scalar, repeat=1),
+    }
+
+
+def bench_activity(hours: float, cache_dir: str, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time each stage of loading a synthetic activity, from the detail cache to split segments
+
+    Args:
+        hours (float): Activity duration in hours
+        cache_dir (str): Scratch cache directory
+        repeat (int): Number of runs per stage, the best time is kept
+
+    Returns:
+        Dict[str, float]: Wall time in seconds per stage
+    """
+    client = SyntheticClient(duration=(hours * 3600, hours * 3600), seed=int(hours * 3600))
+    activity = client.get_run_activities(1)[0]
+    details = client.get_activity_details(activity.activity_id)
+    cache = DetailCache(os.path.join(cache_dir, "details"))
+    cache_client = CacheClient(cache_dir)
+
+    results = {
+        "details_to_array": _timeit(lambda: details_to_array(details), repeat),
+        "cache/write": _timeit(lambda: cache.write(activity.activity_id, details), repeat),
+        "cache/read_arrays": _timeit(lambda: cache.read_arrays(activity.activity_id), repeat),
+        "cache/read": _timeit(lambda: cache.read(activity.activity_id), repeat),
+        "load_details": _timeit(lambda: activity.load_details(cache_client), repeat),
+        "to_df": _timeit(lambda: activity.to_df(cache_client, use_cache=False), repeat),
+        "to_df/1s": _timeit(lambda: activity.to_df(cache_client, resample="1s", use_cache=False), repeat),
+    }
+    df = activity.to_df(cache_client, use_cache=False)
+    resampled = garmin_resample(df)
+    results["garmin_resample"] = _timeit(lambda: garmin_resample(df), repeat)
+    results["split_df"] = _timeit(lambda: split_df(resampled), repeat)
+    return {f"{name}/{hours}h": seconds for name, seconds in results.items()}
+
+
+def bench_batch(n_activities: int, cache_dir: str, hours: float = 0.5) -> Dict[str, float]:
+    """
+    Time caching and loading a batch of synthetic activities
+
+    Args:
+        n_activities (int): Number of activities
+        cache_dir (str): Scratch cache directory
+        hours (float): Duration of each activity in hours
+
+    Returns:
+        Dict[str, float]: Wall time in seconds of each batch operation
+    """
+    client = SyntheticClient(n_activities, duration=(hours * 3600, hours * 3600), seed=n_activities)
+    activities = client.get_run_activities(-1)
+    cache = DetailCache(os.path.join(cache_dir, "details"))
+
+    def write():
+        for activity in activities:
+            cache.write_arrays(activity.activity_id, *client.get_activity_arrays(activity.activity_id))
+
+    results = {
+        "write_arrays": _timeit(write, repeat=1),
+        "load_frames/serial": _timeit(lambda: load_frames(activities, cache_dir, workers=1), repeat=1),
+        "load_frames/parallel": _timeit(lambda: load_frames(activities, cache_dir), repeat=1),
+    }
+    frames = load_frames(activities, cache_dir)
+    results["training_load"] = _timeit(lambda: training_load(activities, None, ftp=280, frames=frames))
+    results["power_agreement"] = _timeit(lambda: power_agreement(activities, None, frames=frames))
+    return {f"batch/{name}/{n_activities}x{hours}h": seconds for name, seconds in results.items()}
+
+
+def run_suite(
+    hours: Sequence[float] = (0.5, 1, 6, 24),
+    batches: Sequence[int] = (10, 100, 1000),
+) -> Dict[str, Any]:
+    """
+    Run every benchmark on synthetic activities, fully offline
+
+    Args:
+        hours (Sequence[float]): Durations of the single activity benchmarks in hours
+        batches (Sequence[int]): Sizes of the batch benchmarks
+
+    Returns:
+        Dict[str, Any]: Environment description and results, times in seconds and memory in bytes
+    """
+    check_resample_equivalence()
+    check_dem_sampling()
+    check_frame_cache_offset()
+    results: Dict[str, float] = {"import/run_with_data.client.garmin": check_import_time()}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for h in hours:
+            results.update(bench_activity(h, cache_dir))
+        for n in batches:
+            results.update(bench_batch(n, os.path.join(cache_dir, f"batch_{n}")))
+    results.update(bench_pace())
+    results.update(bench_details_memory(max(hours)))
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks on synthetic activities")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1, 6, 24], help="Activity durations in hours")
+    parser.add_argument("--batches", type=int, nargs="+", default=[10, 100, 1000], help="Batch sizes")
+    args = parser.parse_args()
+
+    suite = run_suite(args.hours, args.batches)
+    for name, value in suite["results"].items():
+        if name.startswith("memory/"):
+            print(f"{name}: {value / 1024 ** 2:.1f} MiB peak")
+        else:
+            print(f"{name}: {value * 1000:.1f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(suite, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
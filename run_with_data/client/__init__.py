@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import details_to_array
 
 
 class BaseClient(ABC):
@@ -9,4 +14,17 @@ class BaseClient(ABC):
 
     @abstractmethod
     def setup(self):
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_activity_details(self, activity_id: str) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def get_activity_arrays(self, activity_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Return `(metricDescriptors, metric matrix)` of an activity"""
+        details = self.get_activity_details(activity_id)
+        return details["metricDescriptors"], details_to_array(details)
+
+    def get_details_version(self, activity_id: str) -> Optional[str]:
+        """Return a token identifying the stored details of an activity, None if they can't be versioned"""
+        return None
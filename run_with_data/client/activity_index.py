@@ -0,0 +1,62 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from .cache import atomic_write
+
+
+RUN_TYPE_KEYS = ["running", "treadmill_running"]
+
+# file name of the index of activities imported from FIT files, in the cache directory
+IMPORTED_INDEX = "imported.json"
+
+
+class ActivityIndex:
+    """
+    Persisted local index of Garmin activity summaries keyed by `activityId`.
+
+    The index always holds a contiguous, newest-first prefix of the activity history,
+    so new activities can be synced by paging from the newest one until an indexed
+    activity shows up, and older ones by paging from `len(index)`.
+    `complete` is set once the oldest activity of the history has been indexed.
+    Activities imported from elsewhere (e.g. FIT files) go to a separate index.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.activities: Dict[str, Dict[str, Any]] = {}
+        self.complete = False
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.activities = data["activities"]
+            self.complete = data["complete"]
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def __contains__(self, activity_id: str) -> bool:
+        return str(activity_id) in self.activities
+
+    def add(self, summary: Dict[str, Any]) -> None:
+        self.activities[str(summary["activityId"])] = summary
+
+    def count(self, type_keys: Optional[Sequence[str]] = None) -> int:
+        if type_keys is None:
+            return len(self.activities)
+        return sum(
+            activity["activityType"]["typeKey"] in type_keys
+            for activity in self.activities.values()
+        )
+
+    def get_activities(self, type_keys: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Return indexed activity summaries newest first, optionally filtered by activity type"""
+        activities = [
+            activity for activity in self.activities.values()
+            if type_keys is None or activity["activityType"]["typeKey"] in type_keys
+        ]
+        return sorted(activities, key=lambda a: a["startTimeGMT"], reverse=True)
+
+    def save(self) -> None:
+        data = json.dumps({"complete": self.complete, "activities": self.activities})
+        atomic_write(self.path, lambda f: f.write(data.encode()))
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..instrumentation import STATS
+
+
+# bump when the layout of the cached files changes
+CACHE_VERSION = 1
+
+
+@STATS.timed("details_to_array")
+def details_to_array(details: Dict[str, Any]) -> np.ndarray:
+    """
+    Convert the `activityDetailMetrics` of a `get_activity_details` payload to a float array
+
+    Rows are decoded one at a time into a preallocated array, so no intermediate
+    list-of-lists is built.
+
+    Args:
+        details (Dict[str, Any]): Raw activity details payload
+
+    Returns:
+        np.ndarray: Metric matrix of shape (n_rows, n_metrics), missing values are NaN
+    """
+    rows = details.get("activityDetailMetrics") or []
+    metric_array = np.full((len(rows), len(details["metricDescriptors"])), np.nan)
+    for i, row in enumerate(rows):
+        metrics = row["metrics"]
+        metric_array[i, :len(metrics)] = metrics
+    return metric_array
+
+
+def array_to_details(
+    metric_descriptors: List[Dict[str, Any]],
+    metric_array: np.ndarray,
+    payload: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Inverse of `details_to_array`: build a `get_activity_details`-like payload, NaN values become None"""
+    details = dict(payload or {})
+    details["metricDescriptors"] = metric_descriptors
+    rows = np.where(np.isnan(metric_array), None, metric_array).tolist()
+    details["activityDetailMetrics"] = [{"metrics": row} for row in rows]
+    return details
+
+
+_DETAIL_ROWS_KEY = re.compile(r'"activityDetailMetrics"\s*:\s*\[')
+_DESCRIPTORS_KEY = re.compile(r'"metricDescriptors"\s*:\s*')
+
+
+@STATS.timed("cache.decode_json")
+def read_details_json(path: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Stream a `get_activity_details` JSON file into a metric matrix
+
+    The rows of `activityDetailMetrics` are decoded one by one into a preallocated array
+    instead of materializing the whole payload as Python objects.
+
+    Args:
+        path (str): Path to the JSON file
+
+    Returns:
+        Tuple[Dict[str, Any], np.ndarray]: Payload without `activityDetailMetrics` (but with
+            `metricDescriptors`) and the metric matrix, missing values are NaN
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    STATS.count("cache.bytes_read", len(text))
+
+    rows_match = _DETAIL_ROWS_KEY.search(text)
+    descriptors_match = _DESCRIPTORS_KEY.search(text)
+    if rows_match is None or descriptors_match is None:
+        details = json.loads(text)
+        metric_array = details_to_array(details)
+        details.pop("activityDetailMetrics", None)
+        return details, metric_array
+
+    decoder = json.JSONDecoder()
+    descriptors, _ = decoder.raw_decode(text, descriptors_match.end())
+
+    # every row is a {"metrics": [...]} object, count them to size the array
+    n_rows = text.count('"metrics"', rows_match.end())
+    metric_array = np.full((n_rows, len(descriptors)), np.nan)
+
+    i = 0
+    pos = rows_match.end()
+    while True:
+        while text[pos] in " \t\r\n,":
+            pos += 1
+        if text[pos] == "]":
+            break
+        row, pos = decoder.raw_decode(text, pos)
+        if i == len(metric_array):
+            grow = np.full((max(len(metric_array), 1), len(descriptors)), np.nan)
+            metric_array = np.concatenate([metric_array, grow])
+        metrics = row["metrics"]
+        metric_array[i, :len(metrics)] = metrics
+        i += 1
+
+    # decode the remaining (small) part of the payload without the rows
+    details = json.loads(text[:rows_match.end()] + text[pos:])
+    details.pop("activityDetailMetrics", None)
+    return details, metric_array[:i]
+
+
+def atomic_write(path: str, write_fn) -> None:
+    """Write a file through `write_fn(file)` into a temporary file and move it into place"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DetailCache:
+    """
+    Columnar on-disk cache of activity details.
+
+    Each activity is stored as a compressed `.npz` file holding the `metricDescriptors`,
+    the metric matrix as float64 (missing values as NaN) and the remaining payload fields.
+    Legacy `.json` caches are converted on first read or in bulk with `migrate`.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+
+    def path(self, activity_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{activity_id}.npz")
+
+    def json_path(self, activity_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{activity_id}.json")
+
+    def __contains__(self, activity_id: str) -> bool:
+        return os.path.exists(self.path(activity_id)) or os.path.exists(self.json_path(activity_id))
+
+    def version(self, activity_id: str) -> Optional[str]:
+        """Return a token that changes whenever the cached file of an activity changes"""
+        try:
+            stat = os.stat(self.path(activity_id))
+        except FileNotFoundError:
+            return None
+        return f"{CACHE_VERSION}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def write(self, activity_id: str, details: Dict[str, Any]) -> None:
+        payload = {
+            k: v for k, v in details.items()
+            if k not in ("metricDescriptors", "activityDetailMetrics")
+        }
+        self.write_arrays(activity_id, details["metricDescriptors"], details_to_array(details), payload)
+
+    @STATS.timed("cache.write")
+    def write_arrays(
+        self,
+        activity_id: str,
+        metric_descriptors: List[Dict[str, Any]],
+        metric_array: np.ndarray,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        arrays = {
+            "version": np.array(CACHE_VERSION),
+            "descriptors": np.array(json.dumps(metric_descriptors)),
+            "metrics": metric_array,
+            "payload": np.array(json.dumps(payload or {})),
+        }
+        atomic_write(self.path(activity_id), lambda f: np.savez_compressed(f, **arrays))
+
+    def _migrate_one(self, activity_id: str) -> bool:
+        json_path = self.json_path(activity_id)
+        if not os.path.exists(json_path):
+            return False
+        payload, metric_array = read_details_json(json_path)
+        metric_descriptors = payload.pop("metricDescriptors")
+        self.write_arrays(activity_id, metric_descriptors, metric_array, payload)
+        return True
+
+    def _count_read(self, path: str) -> None:
+        if STATS.enabled:
+            STATS.count("cache.bytes_read", os.path.getsize(path))
+
+    @STATS.timed("cache.read_arrays")
+    def read_arrays(self, activity_id: str) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Return `(metricDescriptors, metric matrix)` of a cached activity or None on cache miss"""
+        path = self.path(activity_id)
+        if not os.path.exists(path) and not self._migrate_one(activity_id):
+            return None
+        self._count_read(path)
+        with np.load(path, allow_pickle=False) as data:
+            return json.loads(data["descriptors"].item()), data["metrics"]
+
+    @STATS.timed("cache.read")
+    def read(self, activity_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached activity as a `get_activity_details`-like payload or None on cache miss"""
+        path = self.path(activity_id)
+        if not os.path.exists(path) and not self._migrate_one(activity_id):
+            return None
+        self._count_read(path)
+        with np.load(path, allow_pickle=False) as data:
+            payload = json.loads(data["payload"].item())
+            metrics = data["metrics"]
+            metric_descriptors = json.loads(data["descriptors"].item())
+        return array_to_details(metric_descriptors, metrics, payload)
+
+    def migrate(self, remove_json: bool = False) -> int:
+        """
+        Convert every legacy `.json` cache file to the `.npz` format
+
+        A corrupt or truncated file is logged and skipped, and kept even with `remove_json`.
+
+        Args:
+            remove_json (bool): Delete the `.json` files once converted
+
+        Returns:
+            int: Number of converted activities
+        """
+        from tqdm.auto import tqdm
+
+        json_files = sorted(Path(self.cache_dir).glob("*.json"))
+        migrated = 0
+        for json_file in tqdm(json_files, desc="Migrating cache"):
+            activity_id = json_file.stem
+            if not os.path.exists(self.path(activity_id)):
+                try:
+                    self._migrate_one(activity_id)
+                except (ValueError, KeyError, IndexError) as e:
+                    logging.warning(f"Skipping {json_file}: {e!r}")
+                    continue
+                migrated += 1
+            if remove_json:
+                os.remove(json_file)
+        return migrated
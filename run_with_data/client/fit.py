@@ -0,0 +1,668 @@
+"""
+Dependency-free FIT decoder producing the same activity arrays as the Garmin details endpoint.
+
+The file is scanned once to find the definition of every message and the offset of every
+data message. The data messages of each definition are then gathered into a byte matrix
+and viewed through a numpy structured dtype, so record fields are decoded column by column
+without building per-record Python objects.
+"""
+import io
+import json
+import logging
+import os
+import re
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import BaseClient
+from .activity_index import ActivityIndex, IMPORTED_INDEX, RUN_TYPE_KEYS
+from .cache import DetailCache, array_to_details, atomic_write
+from .local import CacheClient
+from ..schema.run_activity import RunActivity
+
+if TYPE_CHECKING:
+    from ..zone_map import ZoneMapIndex
+
+
+# FIT timestamps count seconds since 1989-12-31T00:00:00Z
+FIT_EPOCH = 631065600
+
+SEMICIRCLES_PER_DEGREE = 2 ** 31 / 180
+
+# global message numbers
+FILE_ID = 0
+SESSION = 18
+RECORD = 20
+ACTIVITY = 34
+FIELD_DESCRIPTION = 206
+DEVELOPER_DATA_ID = 207
+
+FILE_TYPE_ACTIVITY = 4
+
+TIMESTAMP_FIELD = 253
+
+# base type number (low 5 bits of the base type id) -> numpy format, invalid value
+BASE_TYPES: Dict[int, Tuple[str, Optional[int]]] = {
+    0: ("u1", 0xFF),  # enum
+    1: ("i1", 0x7F),
+    2: ("u1", 0xFF),
+    3: ("i2", 0x7FFF),
+    4: ("u2", 0xFFFF),
+    5: ("i4", 0x7FFFFFFF),
+    6: ("u4", 0xFFFFFFFF),
+    7: ("S", None),  # string
+    8: ("f4", None),  # invalid floats are all ones, i.e. NaN
+    9: ("f8", None),
+    10: ("u1", 0),  # uint8z
+    11: ("u2", 0),  # uint16z
+    12: ("u4", 0),  # uint32z
+    13: ("u1", 0xFF),  # byte
+    14: ("i8", 0x7FFFFFFFFFFFFFFF),
+    15: ("u8", 0xFFFFFFFFFFFFFFFF),
+    16: ("u8", 0),  # uint64z
+}
+
+# record field -> Garmin descriptor key, as (field number, scale, offset) alternatives
+# in order of preference, the value is `raw / scale - offset`.
+# Timestamp and cadence are converted separately.
+RECORD_FIELDS: Dict[str, Tuple[Tuple[int, float, float], ...]] = {
+    "directLongitude": ((1, SEMICIRCLES_PER_DEGREE, 0),),
+    "directLatitude": ((0, SEMICIRCLES_PER_DEGREE, 0),),
+    # step length in mm * 10 to cm
+    "directStrideLength": ((85, 100, 0),),
+    "directSpeed": ((73, 1000, 0), (6, 1000, 0)),
+    "directPower": ((7, 1, 0),),
+    "directHeartRate": ((3, 1, 0),),
+    "sumDistance": ((5, 100, 0),),
+    "directVerticalSpeed": ((32, 1000, 0),),
+    # vertical oscillation in mm * 10 to cm
+    "directVerticalOscillation": ((39, 100, 0),),
+    "directVerticalRatio": ((83, 100, 0),),
+    "directGroundContactTime": ((41, 10, 0),),
+    "directGroundContactBalanceLeft": ((84, 100, 0),),
+    "directRespirationRate": ((108, 100, 0), (99, 1, 0)),
+    "directElevation": ((78, 5, 500), (2, 5, 500)),
+}
+CADENCE_FIELD = 4
+FRACTIONAL_CADENCE_FIELD = 53
+
+# (sport, sub sport) -> Garmin activity type key, sub sport None matches any
+SPORT_TYPE_KEYS: Dict[Tuple[int, Optional[int]], str] = {
+    (1, 1): "treadmill_running",
+    (1, 3): "trail_running",
+    (1, None): "running",
+    (2, None): "cycling",
+    (5, None): "swimming",
+    (11, None): "walking",
+    (17, None): "hiking",
+}
+
+
+class NotActivityError(ValueError):
+    """Raised for valid FIT files that don't hold an activity (settings, monitoring, ...)"""
+
+
+class _Definition:
+    """Layout of the data messages of a local message type"""
+
+    def __init__(
+        self,
+        global_num: int,
+        endian: str,
+        fields: List[Tuple[int, int, int]],
+        dev_fields: List[Tuple[int, int, int]],
+    ) -> None:
+        self.global_num = global_num
+        self.endian = endian
+        # (field number, size, base type) and (field number, size, developer data index)
+        self.fields = fields
+        self.dev_fields = dev_fields
+        self.size = sum(size for _, size, _ in fields) + sum(size for _, size, _ in dev_fields)
+        self.timestamp_offset: Optional[int] = None
+        offset = 0
+        for num, size, _ in fields:
+            if num == TIMESTAMP_FIELD and size == 4:
+                self.timestamp_offset = offset
+            offset += size
+        # offsets of the data messages in the file
+        self.positions: List[int] = []
+        # messages with a compressed timestamp header, and their timestamps
+        self.compressed: Optional["_Definition"] = None
+        self.timestamps: List[int] = []
+
+    def compressed_definition(self) -> "_Definition":
+        if self.compressed is None:
+            self.compressed = _Definition(self.global_num, self.endian, self.fields, self.dev_fields)
+        return self.compressed
+
+    def field_types(self, dev_types: Dict[Tuple[int, int], int]) -> Dict[str, Tuple[Optional[int], int, int]]:
+        """Field name -> (base type, offset, size), developer fields are named `dev<index>_<number>`"""
+        types = {}
+        offset = 0
+        for num, size, base_type in self.fields:
+            types.setdefault(str(num), (base_type, offset, size))
+            offset += size
+        for num, size, index in self.dev_fields:
+            types.setdefault(f"dev{index}_{num}", (dev_types.get((index, num)), offset, size))
+            offset += size
+        return types
+
+    def dtype(self, dev_types: Dict[Tuple[int, int], int]) -> np.dtype:
+        types = self.field_types(dev_types)
+        return np.dtype({
+            "names": list(types),
+            "formats": [_field_format(self.endian, base_type, size) for base_type, _, size in types.values()],
+            "offsets": [offset for _, offset, _ in types.values()],
+            "itemsize": self.size,
+        })
+
+
+def _field_format(endian: str, base_type: Optional[int], size: int) -> Any:
+    if base_type is None or base_type & 0x1F not in BASE_TYPES:
+        return f"V{size}"
+    fmt, _ = BASE_TYPES[base_type & 0x1F]
+    if fmt == "S":
+        return f"S{size}"
+    itemsize = np.dtype(fmt).itemsize
+    if size % itemsize:
+        return f"V{size}"
+    if size == itemsize:
+        return endian + fmt
+    return (endian + fmt, (size // itemsize,))
+
+
+def _to_float(raw: np.ndarray, base_type: Optional[int]) -> Optional[np.ndarray]:
+    """Convert a numeric field to float64 with invalid values as NaN, None for non-numeric fields"""
+    if base_type is None or raw.dtype.kind in "SV":
+        return None
+    if raw.ndim > 1:
+        # array fields keep their first element
+        raw = raw[:, 0]
+    values = raw.astype(np.float64)
+    _, invalid = BASE_TYPES[base_type & 0x1F]
+    if invalid is not None:
+        values[raw == invalid] = np.nan
+    return values
+
+
+class _FitFile:
+    """Message layout of a FIT file, decoded into columns on request"""
+
+    def __init__(self, data: bytes) -> None:
+        self.buffer = np.frombuffer(data, dtype=np.uint8)
+        self.definitions: List[_Definition] = []
+        self._scan(data)
+
+        # developer data index -> app id, (index, field number) -> base type and (scale, offset)
+        self.app_ids: Dict[int, str] = {}
+        self.dev_types: Dict[Tuple[int, int], int] = {}
+        self.dev_scales: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        self._read_developer_data()
+
+    def _scan(self, data: bytes) -> None:
+        pos = 0
+        n = len(data)
+        # chained FIT files are read one after another
+        while pos + 12 <= n:
+            header_size = data[pos]
+            if data[pos + 8:pos + 12] != b".FIT":
+                if not self.definitions:
+                    raise ValueError("Not a FIT file")
+                break
+            data_size = int.from_bytes(data[pos + 4:pos + 8], "little")
+            pos += header_size
+            end = min(pos + data_size, n)
+
+            local: Dict[int, _Definition] = {}
+            last_timestamp = 0
+            last_timestamp_message: Optional[Tuple[_Definition, int]] = None
+            while pos < end:
+                header = data[pos]
+                if header & 0x80:
+                    # compressed timestamp header
+                    definition = local.get((header >> 5) & 0x03)
+                    if definition is None:
+                        raise ValueError(f"Data message without definition at byte {pos}")
+                    if pos + 1 + definition.size > end:
+                        break
+                    if last_timestamp_message is not None:
+                        message_definition, offset = last_timestamp_message
+                        start = offset + message_definition.timestamp_offset
+                        last_timestamp = int.from_bytes(
+                            data[start:start + 4], "little" if message_definition.endian == "<" else "big"
+                        )
+                        last_timestamp_message = None
+                    time_offset = header & 0x1F
+                    last_timestamp += (time_offset - last_timestamp) & 0x1F
+                    compressed = definition.compressed_definition()
+                    compressed.positions.append(pos + 1)
+                    compressed.timestamps.append(last_timestamp)
+                    pos += 1 + definition.size
+                elif header & 0x40:
+                    pos = self._read_definition(data, pos, local, has_dev_fields=bool(header & 0x20))
+                else:
+                    definition = local.get(header & 0x0F)
+                    if definition is None:
+                        raise ValueError(f"Data message without definition at byte {pos}")
+                    if pos + 1 + definition.size > end:
+                        break
+                    definition.positions.append(pos + 1)
+                    if definition.timestamp_offset is not None:
+                        last_timestamp_message = (definition, pos + 1)
+                    pos += 1 + definition.size
+            # skip the CRC
+            pos = end + 2
+
+    def _read_definition(self, data: bytes, pos: int, local: Dict[int, _Definition], has_dev_fields: bool) -> int:
+        local_num = data[pos] & 0x0F
+        endian = ">" if data[pos + 2] else "<"
+        global_num = int.from_bytes(data[pos + 3:pos + 5], "big" if endian == ">" else "little")
+        n_fields = data[pos + 5]
+        pos += 6
+        fields = [tuple(data[pos + 3 * i:pos + 3 * i + 3]) for i in range(n_fields)]
+        pos += 3 * n_fields
+        dev_fields = []
+        if has_dev_fields:
+            n_dev_fields = data[pos]
+            pos += 1
+            dev_fields = [tuple(data[pos + 3 * i:pos + 3 * i + 3]) for i in range(n_dev_fields)]
+            pos += 3 * n_dev_fields
+        definition = _Definition(global_num, endian, fields, dev_fields)
+        local[local_num] = definition
+        self.definitions.append(definition)
+        return pos
+
+    def _groups(self, global_num: int) -> List[_Definition]:
+        groups = []
+        for definition in self.definitions:
+            for group in (definition, definition.compressed):
+                if group is not None and group.global_num == global_num and group.positions and group.size:
+                    groups.append(group)
+        return groups
+
+    def _decode(self, group: _Definition) -> np.ndarray:
+        positions = np.asarray(group.positions, dtype=np.int64)
+        rows = self.buffer[positions[:, None] + np.arange(group.size)]
+        return rows.view(group.dtype(self.dev_types)).reshape(-1)
+
+    def messages(self, global_num: int) -> List[np.ndarray]:
+        """Structured arrays of the messages of a global message number, one per definition"""
+        return [self._decode(group) for group in self._groups(global_num)]
+
+    def columns(self, global_num: int) -> Dict[str, np.ndarray]:
+        """Numeric fields of a global message number as float64 columns in file order"""
+        groups = self._groups(global_num)
+        if not groups:
+            return {}
+        positions = np.concatenate([np.asarray(group.positions) for group in groups])
+        order = np.argsort(positions, kind="stable")
+        columns: Dict[str, np.ndarray] = {}
+        start = 0
+        for group in groups:
+            messages = self._decode(group)
+            stop = start + len(messages)
+            for name, (base_type, _, _) in group.field_types(self.dev_types).items():
+                values = _to_float(messages[name], base_type)
+                if values is None:
+                    continue
+                if name not in columns:
+                    columns[name] = np.full(len(positions), np.nan)
+                columns[name][start:stop] = values
+            if group.timestamps:
+                if str(TIMESTAMP_FIELD) not in columns:
+                    columns[str(TIMESTAMP_FIELD)] = np.full(len(positions), np.nan)
+                columns[str(TIMESTAMP_FIELD)][start:stop] = group.timestamps
+            start = stop
+        return {name: column[order] for name, column in columns.items()}
+
+    def _read_developer_data(self) -> None:
+        for messages in self.messages(DEVELOPER_DATA_ID):
+            if "1" not in messages.dtype.names or "3" not in messages.dtype.names:
+                continue
+            for message in messages:
+                app_id = np.asarray(message["1"]).tobytes()
+                if len(app_id) == 16 and app_id != b"\xff" * 16:
+                    self.app_ids[int(message["3"])] = str(uuid.UUID(bytes=app_id))
+
+        for messages in self.messages(FIELD_DESCRIPTION):
+            names = messages.dtype.names
+            if not {"0", "1", "2"} <= set(names):
+                continue
+            for message in messages:
+                key = (int(message["0"]), int(message["1"]))
+                self.dev_types[key] = int(message["2"])
+                scale = int(message["6"]) if "6" in names and message["6"] not in (0, 0xFF) else 1
+                offset = int(message["7"]) if "7" in names and message["7"] != 0x7F else 0
+                self.dev_scales[key] = (scale, offset)
+
+    def file_type(self) -> Optional[int]:
+        column = self.columns(FILE_ID).get("0")
+        if column is None or np.isnan(column[0]):
+            return None
+        return int(column[0])
+
+    def summary(self) -> Dict[str, Any]:
+        """Garmin-like activity summary from the session and activity messages"""
+        session = self.columns(SESSION)
+        start_time = session.get("2", np.array([np.nan]))[0]
+        if np.isnan(start_time):
+            start_time = self.columns(RECORD).get(str(TIMESTAMP_FIELD), np.array([np.nan]))[0]
+        if np.isnan(start_time):
+            raise ValueError("FIT file has no start time")
+
+        activity = self.columns(ACTIVITY)
+        utc_offset = 0
+        if "5" in activity and str(TIMESTAMP_FIELD) in activity:
+            offset = activity["5"][0] - activity[str(TIMESTAMP_FIELD)][0]
+            utc_offset = 0 if np.isnan(offset) else int(offset)
+
+        sport = session.get("5", np.array([np.nan]))[0]
+        sub_sport = session.get("6", np.array([np.nan]))[0]
+        type_key = "other"
+        if not np.isnan(sport):
+            type_key = SPORT_TYPE_KEYS.get(
+                (int(sport), None if np.isnan(sub_sport) else int(sub_sport)),
+                SPORT_TYPE_KEYS.get((int(sport), None), "other"),
+            )
+        calories = session.get("11", np.array([np.nan]))[0]
+
+        start_gmt = datetime.fromtimestamp(start_time + FIT_EPOCH, timezone.utc)
+        start_local = datetime.fromtimestamp(start_time + FIT_EPOCH + utc_offset, timezone.utc)
+        return {
+            "activityName": type_key.replace("_", " ").title(),
+            "startTimeGMT": start_gmt.strftime("%Y-%m-%d %H:%M:%S"),
+            "startTimeLocal": start_local.strftime("%Y-%m-%d %H:%M:%S"),
+            "calories": None if np.isnan(calories) else float(calories),
+            "activityType": {"typeKey": type_key},
+        }
+
+    def records(self) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Record messages as `(metricDescriptors, metric matrix)` with Garmin descriptor keys"""
+        columns = self.columns(RECORD)
+        timestamps = columns.get(str(TIMESTAMP_FIELD))
+        if timestamps is None:
+            raise ValueError("FIT file has no timestamped records")
+
+        descriptors: List[Dict[str, Any]] = []
+        values: List[np.ndarray] = []
+
+        def add(descriptor: Dict[str, Any], column: np.ndarray) -> None:
+            descriptor["metricsIndex"] = len(descriptors)
+            descriptors.append(descriptor)
+            values.append(column)
+
+        add({"key": "directTimestamp"}, (timestamps + FIT_EPOCH) * 1000)
+        for key, alternatives in RECORD_FIELDS.items():
+            for num, scale, offset in alternatives:
+                column = columns.get(str(num))
+                if column is not None and not np.isnan(column).all():
+                    add({"key": key}, column / scale - offset)
+                    break
+        cadence = columns.get(str(CADENCE_FIELD))
+        if cadence is not None:
+            # cadence is in strides per minute, with 1/128 fractions
+            fraction = columns.get(str(FRACTIONAL_CADENCE_FIELD))
+            if fraction is not None:
+                cadence = cadence + np.nan_to_num(fraction) / 128
+            add({"key": "directDoubleCadence"}, cadence * 2)
+
+        for name in sorted(name for name in columns if name.startswith("dev")):
+            index, num = (int(part) for part in name[3:].split("_"))
+            if index not in self.app_ids:
+                continue
+            scale, offset = self.dev_scales.get((index, num), (1, 0))
+            add(
+                {
+                    "key": "connectIQDeveloperField",
+                    "appID": self.app_ids[index],
+                    "developerFieldNumber": num,
+                },
+                columns[name] / scale - offset,
+            )
+        return descriptors, np.column_stack(values)
+
+
+def read_fit(data: bytes) -> Tuple[Dict[str, Any], List[Dict[str, Any]], np.ndarray]:
+    """
+    Decode a FIT activity
+
+    Args:
+        data (bytes): Content of the FIT file
+
+    Returns:
+        Tuple[Dict[str, Any], List[Dict[str, Any]], np.ndarray]: Activity summary (without
+            `activityId`), `metricDescriptors` and the metric matrix, missing values are NaN
+
+    Raises:
+        NotActivityError: If the file is a valid FIT file of another type
+        ValueError: If the file is not a valid FIT file
+    """
+    fit = _FitFile(data)
+    file_type = fit.file_type()
+    if file_type is not None and file_type != FILE_TYPE_ACTIVITY:
+        raise NotActivityError(f"Not a FIT activity file (file type {file_type})")
+    metric_descriptors, metric_array = fit.records()
+    return fit.summary(), metric_descriptors, metric_array
+
+
+def fit_activity_id(name: str) -> str:
+    """Activity id of a FIT file, the last long number in its name (e.g. `<email>_<activity id>.fit`)"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    numbers = re.findall(r"\d{6,}", stem)
+    return numbers[-1] if numbers else stem
+
+
+def _iter_zip(archive: zipfile.ZipFile) -> Iterator[Tuple[str, bytes]]:
+    for info in archive.infolist():
+        name = info.filename.lower()
+        if name.endswith(".fit"):
+            yield info.filename, archive.read(info)
+        elif name.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(archive.read(info))) as nested:
+                yield from _iter_zip(nested)
+
+
+def iter_fit_files(source: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield `(name, content)` of every FIT file in a directory, a FIT file or a zip archive
+
+    Zip archives are searched recursively, so a Garmin data export can be read as is.
+    """
+    source = os.path.expanduser(source)
+    if os.path.isdir(source):
+        for root, _, files in sorted(os.walk(source)):
+            for file in sorted(files):
+                yield from iter_fit_files(os.path.join(root, file))
+    elif source.lower().endswith(".zip"):
+        with zipfile.ZipFile(source) as archive:
+            yield from _iter_zip(archive)
+    elif source.lower().endswith(".fit"):
+        with open(source, "rb") as f:
+            yield source, f.read()
+
+
+def _import_one(name: str, data: bytes, details_dir: str) -> Dict[str, Any]:
+    activity_id = fit_activity_id(name)
+    summary, metric_descriptors, metric_array = read_fit(data)
+    summary["activityId"] = int(activity_id) if activity_id.isdigit() else activity_id
+    DetailCache(details_dir).write_arrays(
+        activity_id, metric_descriptors, metric_array, {"activityId": summary["activityId"]}
+    )
+    return summary
+
+
+def import_fit_files(
+    source: str,
+    cache_dir: str = "~/.cache/garmin_activities",
+    workers: Optional[int] = None,
+    overwrite: bool = False,
+    zone_maps: Optional["ZoneMapIndex"] = None,
+) -> Dict[str, Optional[Exception]]:
+    """
+    Bulk import FIT activities into the detail cache of a cache directory
+
+    Summaries go to a separate `imported.json` index, so the synced index of `GarminClient`
+    stays a contiguous prefix of the Garmin Connect history. Imported activities are then
+    served offline by `CacheClient`, or by `GarminClient` (with `lazy_login=True` and
+    `get_run_activities(sync=False)`), which lists them along with the synced ones. A file that fails to
+    decode (truncated, corrupt or not an activity) is logged and skipped. Files that aren't
+    activities (settings, monitoring, ...) are remembered in `fit_skipped.json` and not
+    decoded again by later imports.
+
+    Args:
+        source (str): Directory of FIT files, FIT file or zip archive (e.g. a Garmin data export)
+        cache_dir (str): Cache directory of the `GarminClient`
+        workers (Optional[int]): Number of decoding processes, defaults to the number of CPUs.
+            With 1 the files are decoded in the current process.
+        overwrite (bool): Re-import activities that are already cached and indexed, and retry
+            files remembered as not being activities
+        zone_maps (Optional[ZoneMapIndex]): Zone map index to add the imported runs to
+
+    Returns:
+        Dict[str, Optional[Exception]]: Activity id of every processed file to None on success
+            or the raised exception on failure (already imported and remembered non-activity
+            files are not processed)
+    """
+    from tqdm.auto import tqdm
+
+    cache_dir = os.path.expanduser(cache_dir)
+    details_cache = DetailCache(os.path.join(cache_dir, "details"))
+    index = ActivityIndex(os.path.join(cache_dir, IMPORTED_INDEX))
+    synced = ActivityIndex(os.path.join(cache_dir, "activities.json"))
+    workers = workers or os.cpu_count()
+
+    skipped_path = os.path.join(cache_dir, "fit_skipped.json")
+    skipped: Set[str] = set()
+    if os.path.exists(skipped_path) and not overwrite:
+        with open(skipped_path, "r") as f:
+            skipped = set(json.load(f))
+    n_skipped = len(skipped)
+
+    def imported(activity_id: str) -> bool:
+        return activity_id in details_cache and (activity_id in index or activity_id in synced)
+
+    files = (
+        (name, data) for name, data in iter_fit_files(source)
+        if overwrite or not (name in skipped or imported(fit_activity_id(name)))
+    )
+    errors: Dict[str, Optional[Exception]] = {}
+    summaries: List[Dict[str, Any]] = []
+    progress = tqdm(desc="Importing FIT files", unit="file")
+
+    def add(name: str, result: Callable[[], Dict[str, Any]]) -> None:
+        progress.update()
+        try:
+            summary = result()
+            index.add(summary)
+            summaries.append(summary)
+        except NotActivityError as e:
+            logging.info(f"Skipping {name}: {e}")
+            skipped.add(name)
+            errors[fit_activity_id(name)] = e
+        except Exception as e:
+            logging.warning(f"Skipping {name}: {e!r}")
+            errors[fit_activity_id(name)] = e
+        else:
+            errors[fit_activity_id(name)] = None
+
+    if workers == 1:
+        for name, data in files:
+            add(name, lambda: _import_one(name, data, details_cache.cache_dir))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # bound the number of files held in memory
+            pending: Dict[Future, str] = {}
+            for name, data in files:
+                if len(pending) >= 4 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        add(pending.pop(future), future.result)
+                pending[executor.submit(_import_one, name, data, details_cache.cache_dir)] = name
+            for future in wait(pending)[0]:
+                add(pending[future], future.result)
+    progress.close()
+
+    if summaries:
+        index.save()
+    if len(skipped) != n_skipped or overwrite:
+        data = json.dumps(sorted(skipped))
+        atomic_write(skipped_path, lambda f: f.write(data.encode()))
+    if zone_maps is not None:
+        zone_maps.update([
+            RunActivity.from_garmin_activity(_s) for _s in summaries
+            if _s["activityType"]["typeKey"] in RUN_TYPE_KEYS
+        ], CacheClient(cache_dir))
+    return errors
+
+
+class FitClient(BaseClient):
+    """
+    Read-only client decoding activity details straight from a directory of FIT files.
+
+    Activity ids are taken from the file names (see `fit_activity_id`). To decode the
+    files only once, import them into the detail cache with `import_fit_files` instead.
+    """
+
+    def __init__(self, fit_dir: str) -> None:
+        self.fit_dir = os.path.expanduser(fit_dir)
+        # activity id -> FIT file, found on first use
+        self._paths: Optional[Dict[str, str]] = None
+        super().__init__()
+
+    def setup(self):
+        pass
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        if self._paths is None:
+            self._paths = {
+                fit_activity_id(file): os.path.join(root, file)
+                for root, _, files in os.walk(self.fit_dir)
+                for file in files
+                if file.lower().endswith(".fit")
+            }
+        return self._paths
+
+    def _read(self, activity_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], np.ndarray]:
+        path = self.paths.get(activity_id)
+        if path is None:
+            raise KeyError(f"No FIT file for activity {activity_id}")
+        with open(path, "rb") as f:
+            return read_fit(f.read())
+
+    def get_activity_arrays(self, activity_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        _, metric_descriptors, metric_array = self._read(activity_id)
+        return metric_descriptors, metric_array
+
+    def get_activity_details(self, activity_id: str) -> Dict[str, Any]:
+        _, metric_descriptors, metric_array = self._read(activity_id)
+        return array_to_details(metric_descriptors, metric_array, {"activityId": activity_id})
+
+    def get_details_version(self, activity_id: str) -> Optional[str]:
+        path = self.paths.get(activity_id)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        return f"fit:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def get_run_activities(self, total: int = 10) -> List[RunActivity]:
+        """Return the latest runs newest first, decoding the summary of every FIT file"""
+        summaries = []
+        for activity_id, path in self.paths.items():
+            try:
+                with open(path, "rb") as f:
+                    summary = _FitFile(f.read()).summary()
+            except Exception as e:
+                logging.warning(f"Skipping {path}: {e!r}")
+                continue
+            if summary["activityType"]["typeKey"] in RUN_TYPE_KEYS:
+                summary["activityId"] = activity_id
+                summaries.append(summary)
+        summaries.sort(key=lambda a: a["startTimeGMT"], reverse=True)
+        summaries = summaries if total == -1 else summaries[:total]
+        return [RunActivity.from_garmin_activity(_a) for _a in summaries]
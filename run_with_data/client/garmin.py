@@ -1,97 +1,290 @@
-import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 
-from garminconnect import Garmin
-from tqdm.auto import tqdm
+import numpy as np
 
 from . import BaseClient
+from .activity_index import ActivityIndex, IMPORTED_INDEX, RUN_TYPE_KEYS
+from .cache import DetailCache, details_to_array
+from ..instrumentation import STATS
 from ..schema.run_activity import RunActivity
 
+if TYPE_CHECKING:
+    from garminconnect import Garmin
+    from ..zone_map import ZoneMapIndex
+
+
+class _RateLimiter:
+    """Thread-safe limiter spacing calls at least `1 / rate` seconds apart"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1. / rate
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
 
 class GarminClient(BaseClient):
+    """
+    Garmin Connect client caching activity details and the activity list locally.
 
-    def __init__(self, cache_dir: str = "~/.cache/garmin_activities") -> None:
-        super().__init__()
+    Session tokens are saved to `tokenstore` after a login and reused by later clients,
+    including other processes, so only the first login needs credentials (and 2FA).
+    With `lazy_login`, no login happens until a request misses the local cache, so
+    cached activities are served without touching Garmin Connect.
+
+    Args:
+        cache_dir (str): Cache directory of the activity details and activity index
+        session (Optional[Garmin]): Already logged in (or fake) Garmin session
+        lazy_login (bool): Log in on the first cache miss instead of on creation
+        tokenstore (Optional[str]): Directory of the saved session tokens, defaults to the
+            `GARMINTOKENS` environment variable or `<cache_dir>/tokens`
+    """
+
+    def __init__(
+        self, 
+        cache_dir: str = "~/.cache/garmin_activities",
+        session: Optional["Garmin"] = None,
+        lazy_login: bool = False,
+        tokenstore: Optional[str] = None,
+    ) -> None:
+        # an already logged in (or fake) Garmin session skips the login in `setup`
+        self.client = session
+        self.lazy_login = lazy_login
         self.cache_dir = os.path.expanduser(cache_dir)
+        self.tokenstore = os.path.expanduser(
+            tokenstore or os.getenv("GARMINTOKENS") or os.path.join(self.cache_dir, "tokens")
+        )
+        self._login_lock = threading.Lock()
+        super().__init__()
         self.details_cache_dir = os.path.join(self.cache_dir, "details")
-        
-        # Create cache directories
-        Path(self.details_cache_dir).mkdir(parents=True, exist_ok=True)
+        self.details_cache = DetailCache(self.details_cache_dir)
+        self.activity_index = ActivityIndex(os.path.join(self.cache_dir, "activities.json"))
 
     def setup(self):
-        try:
-            self.client = Garmin(
+        if not self.lazy_login:
+            self.login()
+
+    def login(self) -> "Garmin":
+        """Log in unless already logged in, resuming the saved session tokens when possible"""
+        with self._login_lock:
+            if self.client is not None:
+                return self.client
+            from garminconnect import Garmin
+
+            client = Garmin(
                 email=os.getenv("GARMIN_EMAIL"), 
-                password=os.getenv("GARMIN_PASSWORD")
+                password=os.getenv("GARMIN_PASSWORD"),
+                prompt_mfa=lambda: input("Please enter the 2FA code sent to your email: "),
             )
-            self.client.login()
-        except Exception as e:
-            if "2FA" in str(e):
-                # Handle 2FA by requesting user input
-                auth_code = input("Please enter the 2FA code sent to your email: ")
-                self.client.login(auth_code)
-            else:
-                raise e
+            # loads the saved tokens, or logs in with the credentials and saves new tokens
+            Path(self.tokenstore).mkdir(parents=True, exist_ok=True)
+            with STATS.span("garmin.login"):
+                client.login(self.tokenstore)
+            self.client = client
+            return client
+
+    @property
+    def api(self) -> "Garmin":
+        """Logged in Garmin session, logging in on first use"""
+        return self.client if self.client is not None else self.login()
 
     def _get_cache_path(self, activity_id: str) -> str:
-        return os.path.join(self.details_cache_dir, f"{activity_id}.json")
+        return self.details_cache.path(activity_id)
 
     def _read_from_cache(self, activity_id: str) -> Dict[str, Any]:
-        cache_path = self._get_cache_path(activity_id)
-        if os.path.exists(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-        return None
+        return self.details_cache.read(activity_id)
 
     def _write_to_cache(self, activity_id: str, data: Dict[str, Any]) -> None:
-        cache_path = self._get_cache_path(activity_id)
-        with open(cache_path, 'w') as f:
-            json.dump(data, f)
+        self.details_cache.write(activity_id, data)
+
+    def migrate_cache(self, remove_json: bool = False) -> int:
+        """Convert legacy JSON detail caches to the columnar format"""
+        return self.details_cache.migrate(remove_json=remove_json)
 
     def get_activity_details(self, activity_id: str) -> Dict[str, Any]:
         # Try to read from cache first
         cached_data = self._read_from_cache(activity_id)
         if cached_data:
+            STATS.count("garmin.cache_hit")
             return cached_data
             
         # If not in cache, fetch from API and cache it
-        data = self.client.get_activity_details(activity_id)
+        STATS.count("garmin.cache_miss")
+        data = self._fetch(activity_id)
         self._write_to_cache(activity_id, data)
         return data
 
-    def get_run_activities(
-        self, 
-        total: int = 10, 
-        page_limit: int = 20
-    ) -> List[RunActivity]:
-        activities = []
+    def get_activity_arrays(self, activity_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        # Cached activities are loaded straight from the columnar cache
+        cached_arrays = self.details_cache.read_arrays(activity_id)
+        if cached_arrays is not None:
+            STATS.count("garmin.cache_hit")
+            return cached_arrays
+
+        STATS.count("garmin.cache_miss")
+        data = self._fetch(activity_id)
+        self._write_to_cache(activity_id, data)
+        return data["metricDescriptors"], details_to_array(data)
+
+    def get_details_version(self, activity_id: str) -> Optional[str]:
+        return self.details_cache.version(activity_id)
+
+    def _fetch(self, activity_id: str) -> Dict[str, Any]:
+        with STATS.span("garmin.fetch"):
+            return self.api.get_activity_details(activity_id)
+
+    def _fetch_to_cache(self, activity_id: str, rate_limiter: Optional[_RateLimiter] = None) -> None:
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        data = self._fetch(activity_id)
+        self._write_to_cache(activity_id, data)
+
+    def prefetch_details(
+        self,
+        activities: List[Union[RunActivity, str]],
+        max_workers: int = 4,
+        rate_limit: Optional[float] = None,
+        zone_maps: Optional["ZoneMapIndex"] = None,
+    ) -> Dict[str, Optional[Exception]]:
+        """
+        Download the details of uncached activities concurrently into the cache
+
+        Args:
+            activities (List[Union[RunActivity, str]]): Activities or activity ids to prefetch
+            max_workers (int): Number of concurrent requests
+            rate_limit (Optional[float]): Maximum number of requests per second, unlimited if None
+            zone_maps (Optional[ZoneMapIndex]): Zone map index to add the cached activities to
+                (only those given as `RunActivity`, ids alone lack the activity summary)
+
+        Returns:
+            Dict[str, Optional[Exception]]: Activity id to None on success or the raised exception on failure
+        """
+        activity_ids = [
+            _a.activity_id if isinstance(_a, RunActivity) else str(_a)
+            for _a in activities
+        ]
+        errors = {}
+        pending = [
+            _id for _id in dict.fromkeys(activity_ids)
+            if _id not in self.details_cache
+        ]
+        rate_limiter = _RateLimiter(rate_limit) if rate_limit else None
+
+        from tqdm.auto import tqdm
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_to_cache, _id, rate_limiter): _id
+                for _id in pending
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Prefetching details"):
+                errors[futures[future]] = future.exception()
+
+        if zone_maps is not None:
+            zone_maps.update([
+                _a for _a in activities
+                if isinstance(_a, RunActivity) and errors.get(_a.activity_id) is None
+            ], self)
+        return {_id: errors.get(_id) for _id in activity_ids}
+
+    def sync_activities(self, total: int = -1, page_limit: int = 20, full: bool = False) -> int:
+        """
+        Sync the local activity index with Garmin Connect
+
+        Only activities newer than the newest indexed one are fetched, stopping at the first
+        already indexed activity. Older history is paged in until the index holds `total` runs
+        (or the whole history if `total` is -1).
+
+        Args:
+            total (int): Number of runs the index should hold, -1 for the whole history
+            page_limit (int): Number of activities per request
+            full (bool): Rebuild the index from scratch
+
+        Returns:
+            int: Number of newly indexed activities
+        """
+        index = self.activity_index
+        if full:
+            index.activities, index.complete = {}, False
+        n_indexed = len(index)
+
+        # fetch activities newer than the newest indexed activity
         start = 0
-        
-        while True:
-            # Get activities for current page
-            limit = page_limit if total == -1 else min(page_limit, total - len(activities))
-            page_activities = self.client.get_activities(start, limit)
-            
-            # Filter running activities
-            running_activities = [
-                activity for activity in page_activities
-                if activity["activityType"]["typeKey"] in ["running", "treadmill_running"]
-            ]
-            
-            activities.extend(running_activities)
-            
+        while n_indexed > 0:
+            page_activities = self.api.get_activities(start, page_limit)
+            new_activities = []
+            for activity in page_activities:
+                if activity["activityId"] in index:
+                    break
+                new_activities.append(activity)
+
+            for activity in new_activities:
+                index.add(activity)
+
+            if len(new_activities) < len(page_activities) or len(page_activities) < page_limit:
+                break
+            start += page_limit
+
+        # page in older history until enough runs are indexed
+        while not index.complete and (total == -1 or index.count(RUN_TYPE_KEYS) < total):
+            n_before = len(index)
+            page_activities = self.api.get_activities(n_before, page_limit)
+            for activity in page_activities:
+                index.add(activity)
+
             # Break if we got fewer activities than requested (no more available)
             if len(page_activities) < page_limit:
+                index.complete = True
+            # a full page of already indexed activities (duplicates, or offsets shifted by
+            # deleted activities) would request the same page forever, retry on the next sync
+            elif len(index) == n_before:
                 break
-                
-            # Break if we've reached the requested total (unless total is -1)
-            if total != -1 and len(activities) >= total:
-                break
-                
-            start += page_limit
-        
+
+        if len(index) != n_indexed or full:
+            index.save()
+        return len(index) - n_indexed
+
+    def get_run_activities(
+        self, 
+        total: int = 10, 
+        page_limit: int = 20,
+        sync: bool = True,
+    ) -> List[RunActivity]:
+        """
+        Return the latest runs, newest first
+
+        Args:
+            total (int): Number of runs, -1 for all of them
+            page_limit (int): Number of activities per request when syncing
+            sync (bool): Sync the activity index with Garmin Connect first. Without syncing
+                only the local index is read, so no login is needed.
+        """
+        if sync:
+            self.sync_activities(total=total, page_limit=page_limit)
+
+        activities = self.activity_index.get_activities(type_keys=RUN_TYPE_KEYS)
+        # runs imported from FIT files are indexed apart, so they never shift the synced prefix
+        imported = ActivityIndex(os.path.join(self.cache_dir, IMPORTED_INDEX))
+        if len(imported):
+            activities = sorted(
+                activities + [
+                    _a for _a in imported.get_activities(type_keys=RUN_TYPE_KEYS)
+                    if _a["activityId"] not in self.activity_index
+                ],
+                key=lambda a: a["startTimeGMT"], reverse=True,
+            )
         # Trim to requested total if needed and total is not -1
         activities = activities if total == -1 else activities[:total]
         activities = [
@@ -100,4 +293,3 @@ class GarminClient(BaseClient):
         ]
 
         return activities
-    
\ No newline at end of file
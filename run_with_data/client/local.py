@@ -0,0 +1,39 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import BaseClient
+from .cache import DetailCache
+
+
+class CacheClient(BaseClient):
+    """
+    Read-only client serving activity details from the local detail cache.
+
+    No authentication is needed, so it can be created freely in worker processes.
+    Activities missing from the cache raise a `KeyError`.
+    """
+
+    def __init__(self, cache_dir: str = "~/.cache/garmin_activities") -> None:
+        super().__init__()
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.details_cache = DetailCache(os.path.join(self.cache_dir, "details"))
+
+    def setup(self):
+        pass
+
+    def get_activity_details(self, activity_id: str) -> Dict[str, Any]:
+        details = self.details_cache.read(activity_id)
+        if details is None:
+            raise KeyError(f"Activity {activity_id} is not cached")
+        return details
+
+    def get_activity_arrays(self, activity_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        arrays = self.details_cache.read_arrays(activity_id)
+        if arrays is None:
+            raise KeyError(f"Activity {activity_id} is not cached")
+        return arrays
+
+    def get_details_version(self, activity_id: str) -> Optional[str]:
+        return self.details_cache.version(activity_id)
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import BaseClient
+from .cache import array_to_details
+from ..data_field.garmin import GarminDefaultField
+from ..data_field.run_power_model import RunPowerModel
+from ..data_field.stryd_zones import StrydZones
+from ..schema.run_activity import RunActivity
+
+
+def _descriptors() -> List[Dict[str, Any]]:
+    """metricDescriptors with every metric of the built-in providers"""
+    descriptors = [{"key": metric.key} for metric in GarminDefaultField.METRICS]
+    for provider in (StrydZones, RunPowerModel):
+        descriptors.extend(
+            {
+                "key": "connectIQDeveloperField",
+                "appID": provider.APP_ID,
+                "developerFieldNumber": metric.developer_field_number,
+            }
+            for metric in provider.METRICS
+        )
+    for i, descriptor in enumerate(descriptors):
+        descriptor["metricsIndex"] = i
+    return descriptors
+
+
+# start time (GMT) of the newest synthetic activity, older ones start a day apart
+LATEST_START = datetime(2024, 1, 1, 6)
+
+
+class SyntheticClient(BaseClient):
+    """
+    Offline client generating realistic `get_activity_details` payloads.
+
+    Every activity is generated deterministically from its id, so the same id always
+    gives the same payload. Payloads use the real `metricDescriptors` keys of
+    `GarminDefaultField`, `StrydZones` and `RunPowerModel`.
+
+    Args:
+        n_activities (int): Number of activities returned by `get_run_activities`
+        duration (Tuple[float, float]): Range of activity durations in seconds
+        sample_interval (float): Base time between samples in seconds
+        jitter (float): Maximum extra time added to each sample interval in seconds
+        pause_probability (float): Probability of a pause after any sample
+        pause_duration (Tuple[float, float]): Range of pause durations in seconds
+        missing_probability (float): Probability of a missing (None) value per metric and sample
+        seed (int): Seed of the activity list
+    """
+
+    def __init__(
+        self,
+        n_activities: int = 10,
+        duration: Tuple[float, float] = (1800, 3600),
+        sample_interval: float = 1.,
+        jitter: float = 4.,
+        pause_probability: float = 0.001,
+        pause_duration: Tuple[float, float] = (30, 180),
+        missing_probability: float = 0.001,
+        seed: int = 0,
+    ) -> None:
+        super().__init__()
+        self.n_activities = n_activities
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.jitter = jitter
+        self.pause_probability = pause_probability
+        self.pause_duration = pause_duration
+        self.missing_probability = missing_probability
+        self.seed = seed
+        self.metric_descriptors = _descriptors()
+
+    def setup(self):
+        pass
+
+    def activity_id(self, i: int) -> str:
+        return str(self.seed * 1_000_000 + i)
+
+    @staticmethod
+    def start_time_gmt(activity_id: str) -> datetime:
+        return LATEST_START - timedelta(days=int(activity_id) % 1_000_000)
+
+    def _activity_summary(self, i: int) -> Dict[str, Any]:
+        activity_id = self.activity_id(i)
+        start_gmt = self.start_time_gmt(activity_id)
+        return {
+            "activityId": int(activity_id),
+            "activityName": f"Synthetic Run {i}",
+            "startTimeGMT": start_gmt.strftime("%Y-%m-%d %H:%M:%S"),
+            "startTimeLocal": (start_gmt + timedelta(hours=7)).strftime("%Y-%m-%d %H:%M:%S"),
+            "calories": 500.,
+            "activityType": {"typeKey": "running"},
+        }
+
+    def get_run_activities(self, total: int = 10, page_limit: int = 20) -> List[RunActivity]:
+        total = self.n_activities if total == -1 else min(total, self.n_activities)
+        return [
+            RunActivity.from_garmin_activity(self._activity_summary(i))
+            for i in range(total)
+        ]
+
+    def generate_arrays(self, activity_id: str) -> np.ndarray:
+        """Generate the metric matrix of an activity, missing values are NaN"""
+        rng = np.random.default_rng(int(activity_id))
+        duration = rng.uniform(*self.duration)
+
+        # irregular sampling with occasional pauses
+        n_max = int(duration / self.sample_interval) + 1
+        steps = self.sample_interval + rng.uniform(0, self.jitter, n_max)
+        pauses = rng.random(n_max) < self.pause_probability
+        steps[pauses] += rng.uniform(*self.pause_duration, pauses.sum())
+        seconds = np.concatenate([[0.], np.cumsum(steps)])
+        seconds = np.round(seconds[seconds <= duration])
+        n = len(seconds)
+
+        start = self.start_time_gmt(activity_id).replace(tzinfo=timezone.utc)
+        speed = np.clip(3. + np.cumsum(rng.normal(0, 0.02, n)), 1.5, 6.)
+        # the watch records a stop before pausing
+        speed[np.flatnonzero(np.diff(seconds) > 10)] = 0.
+        heart_rate = np.clip(120 + 40 * (1 - np.exp(-seconds / 600)) + rng.normal(0, 2, n), 60, 210).round()
+        power = np.clip(speed * 78 + rng.normal(0, 8, n), 0, None)
+        elevation = 10 + np.cumsum(rng.normal(0, 0.1, n))
+        heading = np.cumsum(rng.normal(0, 0.01, n))
+        distance = np.cumsum(speed * np.diff(seconds, prepend=0.))
+
+        columns = {
+            "directLongitude": 100.5 + np.cumsum(speed * np.cos(heading)) / 111_000,
+            "directLatitude": 13.7 + np.cumsum(speed * np.sin(heading)) / 111_000,
+            "directDoubleCadence": np.clip(170 + rng.normal(0, 3, n), 0, None).round(),
+            "directStrideLength": speed / 170 * 60 * 100 * 2,
+            "directSpeed": speed,
+            "directGradeAdjustedSpeed": speed * (1 + rng.normal(0, 0.02, n)),
+            "directPower": power,
+            "directHeartRate": heart_rate,
+            "directTimestamp": (start.timestamp() + seconds) * 1000,
+            "sumMovingDuration": np.cumsum(np.where(speed > 0, np.diff(seconds, prepend=0.), 0.)),
+            "sumDistance": distance,
+            "directVerticalSpeed": np.gradient(elevation),
+            "directVerticalOscillation": 8 + rng.normal(0, 0.3, n),
+            "directVerticalRatio": 7.5 + rng.normal(0, 0.3, n),
+            "directGroundContactTime": 240 + rng.normal(0, 8, n),
+            "directGroundContactBalanceLeft": 50 + rng.normal(0, 0.5, n),
+            "directRespirationRate": 30 + rng.normal(0, 2, n),
+            "directElevation": elevation,
+        }
+        values = np.empty((n, len(self.metric_descriptors)))
+        for i, descriptor in enumerate(self.metric_descriptors):
+            if descriptor["key"] in columns:
+                values[:, i] = columns[descriptor["key"]]
+            elif descriptor["appID"] == StrydZones.APP_ID and descriptor["developerFieldNumber"] == 0:
+                values[:, i] = power * 0.92 + rng.normal(0, 3, n)
+            elif descriptor["appID"] == RunPowerModel.APP_ID and descriptor["developerFieldNumber"] == 0:
+                values[:, i] = np.roll(power, 3) * 1.05
+            else:
+                values[:, i] = rng.normal(50, 5, n)
+
+        missing = rng.random(values.shape) < self.missing_probability
+        # timestamps are never missing
+        keys = [descriptor["key"] for descriptor in self.metric_descriptors]
+        missing[:, keys.index("directTimestamp")] = False
+        values[missing] = np.nan
+        return values
+
+    def get_activity_arrays(self, activity_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        return self.metric_descriptors, self.generate_arrays(activity_id)
+
+    def get_activity_details(self, activity_id: str) -> Dict[str, Any]:
+        values = self.generate_arrays(activity_id)
+        payload = {
+            "activityId": int(activity_id),
+            "measurementCount": len(self.metric_descriptors),
+            "metricsCount": len(values),
+        }
+        return array_to_details(self.metric_descriptors, values, payload)
+
+    def get_details_version(self, activity_id: str) -> Optional[str]:
+        return None
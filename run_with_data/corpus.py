@@ -0,0 +1,206 @@
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .client import BaseClient
+from .client.cache import atomic_write
+from .schema.run_activity import RunActivity
+
+if TYPE_CHECKING:
+    from .zone_map import ZoneMapIndex
+
+
+TIMESTAMP = "Timestamp"
+
+
+def _storage_dtype(dtype: np.dtype) -> np.dtype:
+    # missing columns are padded with NaN, so integer columns are stored as float32
+    return dtype if dtype.kind == "f" else np.dtype(np.float32)
+
+
+class CorpusStore:
+    """
+    Time series of many activities packed into one memory-mapped file per column.
+
+    Activities are appended one after another, so every column file holds the same rows
+    and activity `i` spans rows `starts[i]:stops[i]` of all of them. Columns an activity
+    doesn't have are NaN over its rows. The `Timestamp` column holds the (local time) index
+    of the dataframes as int64 nanoseconds.
+
+    Appending only writes past the end of the column files (a column first seen later
+    starts with NaN for earlier rows), existing rows are never rewritten. `index.json`
+    is written last, rows written past its `n_rows` by an interrupted append are
+    discarded on the next append.
+
+    With `zone_maps`, `update` also adds the activities it appends to that zone map index.
+    """
+
+    def __init__(
+        self,
+        path: str = "~/.cache/garmin_activities/corpus",
+        resample: Optional[str] = "1s",
+        zone_maps: Optional["ZoneMapIndex"] = None,
+    ) -> None:
+        if zone_maps is not None and resample != "1s":
+            raise ValueError(f"Zone maps need a corpus resampled at 1s, not {resample}")
+        self.zone_maps = zone_maps
+        self.path = os.path.expanduser(path)
+        self.columns_dir = os.path.join(self.path, "columns")
+        Path(self.columns_dir).mkdir(parents=True, exist_ok=True)
+        self.index_path = os.path.join(self.path, "index.json")
+
+        self.resample = resample
+        self.n_rows = 0
+        # column name -> (file name, dtype)
+        self.layout: Dict[str, Tuple[str, str]] = {}
+        # activity id -> {"start", "stop", "columns", "start_time"}
+        self.activities: Dict[str, Dict] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index["resample"] != resample:
+                raise ValueError(
+                    f"Corpus at {self.path} is resampled at {index['resample']}, not {resample}"
+                )
+            self.n_rows = index["n_rows"]
+            self.layout = {name: tuple(value) for name, value in index["layout"].items()}
+            self.activities = index["activities"]
+        self._maps: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def __contains__(self, activity_id: str) -> bool:
+        return activity_id in self.activities
+
+    @property
+    def activity_ids(self) -> List[str]:
+        return list(self.activities)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.layout)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.columns_dir, self.layout[name][0])
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map of a column over every activity"""
+        if name not in self._maps:
+            dtype = np.dtype(self.layout[name][1])
+            if self.n_rows == 0:
+                self._maps[name] = np.empty(0, dtype=dtype)
+            else:
+                self._maps[name] = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(self.n_rows,))
+        return self._maps[name]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.column(TIMESTAMP).view("datetime64[ns]")
+
+    def bounds(self, activity_ids: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Start and stop rows of activities (all of them by default), for vectorized passes over ragged batches"""
+        activity_ids = self.activity_ids if activity_ids is None else activity_ids
+        starts = np.array([self.activities[_id]["start"] for _id in activity_ids], dtype=np.int64)
+        stops = np.array([self.activities[_id]["stop"] for _id in activity_ids], dtype=np.int64)
+        return starts, stops
+
+    def rows(self, activity_id: str) -> slice:
+        activity = self.activities[activity_id]
+        return slice(activity["start"], activity["stop"])
+
+    def frame(self, activity_id: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Dataframe of an activity, with the columns it was stored with (or `columns`)"""
+        rows = self.rows(activity_id)
+        columns = self.activities[activity_id]["columns"] if columns is None else columns
+        return pd.DataFrame(
+            {name: self.column(name)[rows] for name in columns},
+            index=pd.DatetimeIndex(self.timestamps[rows], name=TIMESTAMP),
+        )
+
+    def _add_column(self, name: str, dtype: np.dtype) -> None:
+        slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+        file_name = f"{len(self.layout)}_{slug}.bin"
+        self.layout[name] = (file_name, dtype.str)
+        # earlier activities don't have the column
+        with open(self._column_path(name), "wb") as f:
+            np.full(self.n_rows, np.nan, dtype=dtype).tofile(f)
+
+    def append(self, activity_id: str, df: pd.DataFrame, start_time: Optional[datetime] = None, save: bool = True) -> None:
+        """
+        Append the dataframe of an activity (from `RunActivity.to_df`) to the corpus
+
+        Args:
+            activity_id (str): Activity id, must not be stored yet
+            df (pd.DataFrame): Dataframe indexed by timestamp
+            start_time (Optional[datetime]): Start time of the activity, defaults to its first timestamp
+            save (bool): Write the index, set to False when appending many activities then call `save`
+        """
+        if activity_id in self.activities:
+            raise KeyError(f"Activity {activity_id} is already stored")
+        if self.n_rows == 0 and TIMESTAMP not in self.layout:
+            self._add_column(TIMESTAMP, np.dtype(np.int64))
+
+        data = {TIMESTAMP: df.index.values.astype("datetime64[ns]").view(np.int64)}
+        data.update({name: df[name].to_numpy() for name in df.columns})
+        for name, values in data.items():
+            if name not in self.layout:
+                self._add_column(name, _storage_dtype(values.dtype))
+
+        n = len(df)
+        for name, (_, dtype) in self.layout.items():
+            values = data.get(name)
+            values = np.full(n, np.nan, dtype=dtype) if values is None else values.astype(dtype, copy=False)
+            with open(self._column_path(name), "r+b") as f:
+                # drop rows of an interrupted append
+                f.truncate(self.n_rows * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                values.tofile(f)
+
+        self.activities[activity_id] = {
+            "start": self.n_rows,
+            "stop": self.n_rows + n,
+            "columns": list(df.columns),
+            "start_time": (start_time or df.index[0]).isoformat() if n else None,
+        }
+        self.n_rows += n
+        self._maps.clear()
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        data = json.dumps({
+            "resample": self.resample,
+            "n_rows": self.n_rows,
+            "layout": self.layout,
+            "activities": self.activities,
+        })
+        atomic_write(self.index_path, lambda f: f.write(data.encode()))
+
+    def update(self, activities: List[RunActivity], client: BaseClient) -> int:
+        """
+        Append the activities that are not stored yet
+
+        Returns:
+            int: Number of appended activities
+        """
+        added = 0
+        for activity in activities:
+            if activity.activity_id in self:
+                continue
+            df = activity.to_df(client, resample=self.resample, use_cache=False)
+            self.append(activity.activity_id, df, activity.start_time, save=False)
+            if self.zone_maps is not None and activity.activity_id not in self.zone_maps:
+                self.zone_maps.add_activity(activity, df, save=False)
+            added += 1
+        if added:
+            self.save()
+            if self.zone_maps is not None:
+                self.zone_maps.save()
+        return added
@@ -1,10 +1,12 @@
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
 
 from ..schema.run_metric import RunMetric
 
 
 class RunDataProvider:
+    # short name of the power source when the provider records running power
+    POWER_SOURCE: Optional[str] = None
     
     def __init__(
         self,
@@ -43,3 +45,77 @@ class RunDataProvider:
         else:
             # garmin field
             return self[metric_dict["key"]]
+
+
+class ProviderRegistry:
+    """
+    Registry of data providers keyed by Connect IQ app id.
+
+    Metric descriptor layouts are resolved once and cached, so activities recorded
+    with the same watch and apps map their columns to metrics with a single lookup.
+    """
+
+    def __init__(self) -> None:
+        self.providers: Dict[str, RunDataProvider] = {}
+        self.default: Optional[RunDataProvider] = None
+        self._layouts: Dict[Tuple, Tuple[Tuple[Optional[RunMetric], ...], Tuple[Optional[RunDataProvider], ...]]] = {}
+
+    def register(self, provider_cls: Type[RunDataProvider], default: bool = False) -> Type[RunDataProvider]:
+        """Register a provider class by its `APP_ID`, can be used as a class decorator"""
+        provider = provider_cls()
+        self.providers[provider.app_id] = provider
+        if default:
+            self.default = provider
+        self._layouts.clear()
+        return provider_cls
+
+    def get(self, app_id: str) -> Optional[RunDataProvider]:
+        return self.providers.get(app_id)
+
+    def get_provider(self, metric: Dict[str, Any]) -> Optional[RunDataProvider]:
+        """Return the data provider of a metric from the metricDescriptors field"""
+        if "key" in metric and "IQDeveloper" in metric["key"]:
+            provider = self.providers.get(metric["appID"])
+            if provider is None:
+                logging.warning(f"Unknown app id: {metric['appID']}, skipping...")
+            return provider
+        return self.default
+
+    def _resolve_layout(
+        self,
+        metric_descriptors: Sequence[Dict[str, Any]]
+    ) -> Tuple[Tuple[Optional[RunMetric], ...], Tuple[Optional[RunDataProvider], ...]]:
+        layout = tuple(
+            (_m.get("key"), _m.get("appID"), _m.get("developerFieldNumber"))
+            for _m in metric_descriptors
+        )
+        resolved = self._layouts.get(layout)
+        if resolved is None:
+            metrics, providers = [], []
+            for metric in metric_descriptors:
+                provider = self.get_provider(metric)
+                run_metric = provider.get_metric_from_dict(metric) if provider else None
+                metrics.append(run_metric)
+                providers.append(provider if run_metric else None)
+            resolved = self._layouts[layout] = (tuple(metrics), tuple(providers))
+        return resolved
+
+    def resolve(self, metric_descriptors: Sequence[Dict[str, Any]]) -> Tuple[Optional[RunMetric], ...]:
+        """Map every entry of metricDescriptors to its metric, None for unknown metrics"""
+        return self._resolve_layout(metric_descriptors)[0]
+
+    def resolve_providers(self, metric_descriptors: Sequence[Dict[str, Any]]) -> Tuple[Optional[RunDataProvider], ...]:
+        """Map every entry of metricDescriptors to its data provider, None for unknown metrics"""
+        return self._resolve_layout(metric_descriptors)[1]
+
+
+PROVIDER_REGISTRY = ProviderRegistry()
+
+
+def register_provider(provider_cls: Type[RunDataProvider]) -> Type[RunDataProvider]:
+    """Class decorator registering a Connect IQ data provider"""
+    return PROVIDER_REGISTRY.register(provider_cls)
+
+
+# register the built-in providers
+from . import garmin, run_power_model, stryd_zones  # noqa: E402
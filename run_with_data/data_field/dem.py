@@ -0,0 +1,81 @@
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# SRTM marks missing samples with this value
+SRTM_VOID = -32768
+
+
+class DEMTiles:
+    """
+    Local digital elevation model made of SRTM `.hgt` tiles.
+
+    Tiles are named after their south-west corner (e.g. `N13E100.hgt`), hold big-endian
+    int16 elevations in meters on a square grid (1201 or 3601 samples per side) with the
+    first row on the north edge, and are memory-mapped on first use.
+    """
+
+    def __init__(self, tile_dir: str) -> None:
+        self.tile_dir = os.path.expanduser(tile_dir)
+        self.tiles: Dict[Tuple[int, int], Optional[np.ndarray]] = {}
+
+    @staticmethod
+    def tile_name(lat: int, lng: int) -> str:
+        return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lng >= 0 else 'W'}{abs(lng):03d}.hgt"
+
+    def tile(self, lat: int, lng: int) -> Optional[np.ndarray]:
+        """Return the memory-mapped tile whose south-west corner is (lat, lng), None if missing"""
+        if (lat, lng) not in self.tiles:
+            path = os.path.join(self.tile_dir, self.tile_name(lat, lng))
+            tile = None
+            if os.path.exists(path):
+                size = math.isqrt(os.path.getsize(path) // 2)
+                tile = np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+            self.tiles[(lat, lng)] = tile
+        return self.tiles[(lat, lng)]
+
+    def sample(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly interpolate elevations at the given coordinates
+
+        Args:
+            lats (np.ndarray): Latitudes in degrees
+            lngs (np.ndarray): Longitudes in degrees
+
+        Returns:
+            np.ndarray: Elevations in meters, NaN where the tile is missing or the data is void
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        elevations = np.full(lats.shape, np.nan)
+
+        tile_lats = np.floor(lats).astype(np.int64)
+        tile_lngs = np.floor(lngs).astype(np.int64)
+        tile_keys, inverse = np.unique(np.stack([tile_lats, tile_lngs], axis=-1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        for i, (tile_lat, tile_lng) in enumerate(tile_keys):
+            tile = self.tile(int(tile_lat), int(tile_lng))
+            if tile is None:
+                continue
+            mask = inverse == i
+            last = tile.shape[0] - 1
+
+            # fractional grid position, row 0 is the north edge
+            rows = (tile_lat + 1 - lats[mask]) * last
+            cols = (lngs[mask] - tile_lng) * last
+            r0 = np.clip(np.floor(rows).astype(np.int64), 0, last - 1)
+            c0 = np.clip(np.floor(cols).astype(np.int64), 0, last - 1)
+            dr = rows - r0
+            dc = cols - c0
+
+            corners = [tile[r0, c0], tile[r0, c0 + 1], tile[r0 + 1, c0], tile[r0 + 1, c0 + 1]]
+            corners = [np.where(_c == SRTM_VOID, np.nan, _c.astype(np.float64)) for _c in corners]
+            top = corners[0] * (1 - dc) + corners[1] * dc
+            bottom = corners[2] * (1 - dc) + corners[3] * dc
+            elevations[mask] = top * (1 - dr) + bottom * dr
+
+        return elevations
@@ -1,59 +1,177 @@
 import os
-from time import sleep
-from typing import List, Tuple
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
+from .dem import DEMTiles
 
-def get_elevation_data(coordinates: List[Tuple[float, float]]) -> List[float]:
+
+GOOGLE_ELEVATION_URL = "https://maps.googleapis.com/maps/api/elevation/json"
+
+# Google Maps API has a limit of 500 locations per request
+BATCH_SIZE = 500
+
+
+class ElevationCache:
+    """
+    Persistent elevation cache keyed on quantized coordinates.
+
+    Coordinates are rounded to `precision` decimals (5 decimals is ~1 m), so nearby
+    samples of repeated routes share the same entry.
+    """
+
+    def __init__(self, path: str = "~/.cache/garmin_activities/elevation.sqlite", precision: int = 5) -> None:
+        self.path = os.path.expanduser(path)
+        self.precision = precision
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS elevation "
+            "(lat INTEGER, lng INTEGER, elevation REAL, PRIMARY KEY (lat, lng))"
+        )
+
+    def quantize(self, lat: float, lng: float) -> Tuple[int, int]:
+        scale = 10 ** self.precision
+        return round(lat * scale), round(lng * scale)
+
+    def dequantize(self, key: Tuple[int, int]) -> Tuple[float, float]:
+        scale = 10 ** self.precision
+        return key[0] / scale, key[1] / scale
+
+    def get_many(self, keys: Sequence[Tuple[int, int]]) -> Dict[Tuple[int, int], float]:
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (lat INTEGER, lng INTEGER)")
+        self.conn.execute("DELETE FROM lookup")
+        self.conn.executemany("INSERT INTO lookup VALUES (?, ?)", keys)
+        rows = self.conn.execute(
+            "SELECT e.lat, e.lng, e.elevation FROM lookup l "
+            "JOIN elevation e ON e.lat = l.lat AND e.lng = l.lng"
+        )
+        return {(lat, lng): elevation for lat, lng, elevation in rows}
+
+    def put_many(self, elevations: Dict[Tuple[int, int], float]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO elevation VALUES (?, ?, ?)",
+                [(lat, lng, elevation) for (lat, lng), elevation in elevations.items()]
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _fetch_batch(
+    session: requests.Session,
+    base_url: str,
+    api_key: str,
+    batch: Sequence[Tuple[float, float]]
+) -> List[float]:
+    # Format coordinates for API request
+    locations = "|".join(f"{lat},{lng}" for lat, lng in batch)
+
+    params = {
+        'locations': locations,
+        'key': api_key
+    }
+
+    response = session.get(base_url, params=params)
+
+    if response.status_code != 200:
+        raise ValueError(f"API request failed with status code {response.status_code}")
+
+    data = response.json()
+
+    if data['status'] != 'OK':
+        raise ValueError(f"API request failed with status: {data['status']}")
+
+    return [result['elevation'] for result in data['results']]
+
+
+@lru_cache(maxsize=None)
+def _dem_tiles(dem_dir: str) -> DEMTiles:
+    return DEMTiles(dem_dir)
+
+
+def get_elevation_data(
+    coordinates: List[Tuple[float, float]],
+    cache: Optional[ElevationCache] = None,
+    base_url: str = GOOGLE_ELEVATION_URL,
+    session: Optional[requests.Session] = None,
+    max_workers: int = 4,
+    backend: Literal["google", "dem"] = "google",
+    dem_dir: Optional[str] = None,
+) -> List[float]:
     """
-    Get elevation data for a list of coordinates using Google Maps Elevation API.
-    
+    Get elevation data for a list of coordinates using Google Maps Elevation API
+    or local DEM tiles.
+
+    With the Google backend, coordinates are quantized and deduplicated, and only those
+    missing from the persistent cache are requested, in concurrent batches over a pooled
+    session. The DEM backend interpolates SRTM `.hgt` tiles from `dem_dir` offline.
+
     Args:
         coordinates: List of (latitude, longitude) tuples
-        
+        cache: Elevation cache, defaults to `ElevationCache()`
+        base_url: Elevation API endpoint
+        session: HTTP session to send the requests with
+        max_workers: Number of concurrent batch requests
+        backend: "google" for the Elevation API or "dem" for local tiles
+        dem_dir: Directory of the `.hgt` tiles, defaults to the `DEM_DIR` environment variable
+
     Returns:
-        List of elevation values in meters
-        
+        List of elevation values in meters (NaN for coordinates outside the DEM tiles)
+
     Raises:
-        ValueError: If API key is not set or API request fails
+        ValueError: If API key (or DEM directory) is not set or API request fails
     """
-    api_key = os.getenv('GOOGLE_MAPS_API_KEY')
-    if not api_key:
-        raise ValueError("GOOGLE_MAPS_API_KEY environment variable is not set")
-    
-    base_url = "https://maps.googleapis.com/maps/api/elevation/json"
-    elevations = []
-    
-    # Google Maps API has a limit of 500 locations per request
-    batch_size = 500
-    
-    for i in range(0, len(coordinates), batch_size):
-        batch = coordinates[i:i + batch_size]
-        
-        # Format coordinates for API request
-        locations = "|".join(f"{lat},{lng}" for lat, lng in batch)
-        
-        params = {
-            'locations': locations,
-            'key': api_key
-        }
-        
-        response = requests.get(base_url, params=params)
-        
-        if response.status_code != 200:
-            raise ValueError(f"API request failed with status code {response.status_code}")
-        
-        data = response.json()
-        
-        if data['status'] != 'OK':
-            raise ValueError(f"API request failed with status: {data['status']}")
-        
-        batch_elevations = [result['elevation'] for result in data['results']]
-        elevations.extend(batch_elevations)
-        
-        # Add a small delay to respect API rate limits
-        if i + batch_size < len(coordinates):
-            sleep(0.1)
-    
-    return elevations
+    if backend == "dem":
+        dem_dir = dem_dir or os.getenv('DEM_DIR')
+        if not dem_dir:
+            raise ValueError("DEM_DIR environment variable is not set")
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        return _dem_tiles(dem_dir).sample(coordinates[:, 0], coordinates[:, 1]).tolist()
+    elif backend != "google":
+        raise ValueError(f"Invalid backend: {backend}")
+
+    own_cache = cache is None
+    cache = cache or ElevationCache()
+    try:
+        keys = [cache.quantize(lat, lng) for lat, lng in coordinates]
+        unique_keys = list(dict.fromkeys(keys))
+        elevations = cache.get_many(unique_keys)
+        missing = [key for key in unique_keys if key not in elevations]
+
+        if missing:
+            api_key = os.getenv('GOOGLE_MAPS_API_KEY')
+            if not api_key:
+                raise ValueError("GOOGLE_MAPS_API_KEY environment variable is not set")
+
+            if session is None:
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_maxsize=max_workers))
+
+            batches = [missing[i:i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    lambda batch: _fetch_batch(
+                        session, base_url, api_key, [cache.dequantize(key) for key in batch]
+                    ),
+                    batches
+                )
+                fetched = {
+                    key: elevation
+                    for batch, batch_elevations in zip(batches, results)
+                    for key, elevation in zip(batch, batch_elevations)
+                }
+            cache.put_many(fetched)
+            elevations.update(fetched)
+
+        return [elevations[key] for key in keys]
+    finally:
+        if own_cache:
+            cache.close()
@@ -1,7 +1,7 @@
 import logging
 from typing import Optional
 
-from . import RunDataProvider
+from . import PROVIDER_REGISTRY, RunDataProvider
 from . import RunMetric
 
 
@@ -9,24 +9,28 @@ class GarminDefaultField(RunDataProvider):
     NAME = "Default Garmin Field"
     APP_ID = "00000000-0000-0000-0000-000000000000"
     AUTHOR = "Garmin"
+    POWER_SOURCE = "garmin"
     METRICS = [
         RunMetric(
             name="Longitude",
             unit="Watt",
             description="Running power",
-            key="directLongitude"
+            key="directLongitude",
+            dtype="float64"
         ),
         RunMetric(
             name="Latitude",
             unit="Watt",
             description="Running power",
-            key="directLatitude"
+            key="directLatitude",
+            dtype="float64"
         ),
         RunMetric(
             name="Cadence",
             unit="spm",
             description="Number of steps per minutes",
-            key="directDoubleCadence"
+            key="directDoubleCadence",
+            dtype="uint16"
         ),
         RunMetric(
             name="Stride Length",
@@ -56,13 +60,15 @@ class GarminDefaultField(RunDataProvider):
             name="Heart Rate",
             unit="bpm",
             description="Measured heart rate from Garmin",
-            key="directHeartRate"
+            key="directHeartRate",
+            dtype="uint8"
         ),
         RunMetric(
             name="Timestamp",
             unit="milli epoch time",
             description="UNIX timestamp in milli epoch. Divide by 1000 to convert to second.",
-            key="directTimestamp"
+            key="directTimestamp",
+            dtype="float64"
         ),
         RunMetric(
             name="Moving Duration",
@@ -74,7 +80,8 @@ class GarminDefaultField(RunDataProvider):
             name="Total Distance",
             unit="meter",
             description="Total run distance",
-            key="sumDistance"
+            key="sumDistance",
+            dtype="float64"
         ),
         RunMetric(
             name="Vertical Speed",
@@ -134,3 +141,6 @@ class GarminDefaultField(RunDataProvider):
         else:
             # logging.warning(f"Unknown key: {key}")
             return None
+
+
+PROVIDER_REGISTRY.register(GarminDefaultField, default=True)
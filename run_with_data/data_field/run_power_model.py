@@ -1,13 +1,15 @@
-from . import RunDataProvider
+from . import RunDataProvider, register_provider
 
 from ..schema.run_metric import RunMetric
 
 
+@register_provider
 class RunPowerModel(RunDataProvider):
 
     NAME = "RunPowerModel - Wrist-Based Running Power Meter"
     APP_ID = "6ac39398-29fa-4183-a9ac-8396ce941446"
     AUTHOR = "MarkusHoller"
+    POWER_SOURCE = "runpowermodel"
     METRICS = [
         RunMetric(
             name="Running Power",
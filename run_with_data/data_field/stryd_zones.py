@@ -1,12 +1,14 @@
-from . import RunDataProvider
+from . import RunDataProvider, register_provider
 
 from ..schema.run_metric import RunMetric
 
 
+@register_provider
 class StrydZones(RunDataProvider):
     NAME = "StrydZones - Running Power Zones"
     APP_ID = "18fb2cf0-1a4b-430d-ad66-988c847421f4"
     AUTHOR = "StrydTeam"
+    POWER_SOURCE = "stryd"
     METRICS = [
         RunMetric(
             name="Vertical Oscillation Balance",
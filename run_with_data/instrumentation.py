@@ -0,0 +1,116 @@
+"""
+Opt-in instrumentation of the hot paths of the package.
+
+Usage:
+
+    from run_with_data.instrumentation import STATS
+
+    STATS.enable()
+    df = activity.to_df(client, resample="1s")
+    print(STATS.to_json())
+
+Recording is disabled by default, or enabled from the start with `RUN_WITH_DATA_STATS=1`
+(e.g. for worker processes). While disabled, `span` returns a shared no-op context manager
+and `count` returns immediately. Stats are per process.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, TypeVar
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_NULL_SPAN = nullcontext()
+
+
+class Stats:
+    """
+    Wall time of named spans and named counters (cache hits/misses, bytes read).
+
+    Spans can nest, e.g. "to_df" includes "load_details" and "garmin_resample".
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        # name -> [calls, total seconds, max seconds]
+        self.spans: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def span(self, name: str) -> ContextManager[None]:
+        """Time the enclosed block under `name`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Decorator timing every call of a function under `name`"""
+        def decorator(fn: F) -> F:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self._span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = max(span[2], seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "spans": {
+                    name: {"calls": calls, "total": total, "mean": total / calls, "max": max_}
+                    for name, (calls, total, max_) in self.spans.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        """Return the stats as JSON, also written to `path` if given"""
+        output = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(output)
+        return output
+
+
+STATS = Stats(enabled=os.getenv("RUN_WITH_DATA_STATS") == "1")
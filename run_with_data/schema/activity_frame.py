@@ -0,0 +1,101 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .run_metric import RunMetric
+
+if TYPE_CHECKING:
+    from ..data_field import RunDataProvider
+
+
+# metric names recording running power
+POWER_METRIC_NAMES = ("power", "running power")
+
+
+class MetricIndex:
+    """
+    Lookup of the columns of an activity, built once when its details load.
+
+    Columns are indexed by lowercased metric name, by `(name, app id)` and, for power
+    metrics, by the `POWER_SOURCE` of their provider (e.g. "stryd", "garmin").
+    The first column wins when a key appears more than once.
+    """
+
+    def __init__(
+        self,
+        metrics: Sequence[Optional[RunMetric]],
+        providers: Sequence[Optional["RunDataProvider"]],
+    ) -> None:
+        self.by_name: Dict[str, int] = {}
+        self.by_app: Dict[Tuple[str, str], int] = {}
+        self.power: Dict[str, int] = {}
+        for i, (metric, provider) in enumerate(zip(metrics, providers)):
+            if metric is None:
+                continue
+            name = metric.name.lower()
+            self.by_name.setdefault(name, i)
+            if provider is None:
+                continue
+            self.by_app.setdefault((name, provider.app_id), i)
+            if name in POWER_METRIC_NAMES and provider.POWER_SOURCE is not None:
+                self.power.setdefault(provider.POWER_SOURCE, i)
+
+    def get(self, name: str, app_id: Optional[str] = None) -> Optional[int]:
+        """Return the column of a metric by name, optionally from a given app"""
+        if app_id is None:
+            return self.by_name.get(name.lower())
+        return self.by_app.get((name.lower(), app_id))
+
+    def get_power(self, source: str) -> Optional[int]:
+        """Return the power column of a source ("stryd", "garmin", "runpowermodel")"""
+        return self.power.get(source)
+
+    @property
+    def power_sources(self) -> List[str]:
+        return list(self.power)
+
+
+class ActivityFrame:
+    """
+    Columnar container holding the metrics of a single activity.
+
+    All metrics live in one column-major 2D array, `metrics[i]` describes column `i`
+    (None for metrics without a known provider). The metric descriptions are shared
+    between activities and are never written to, per-activity values are always views
+    into `values`. `providers[i]` is the data provider of column `i`.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        metrics: Sequence[Optional[RunMetric]],
+        providers: Optional[Sequence[Optional["RunDataProvider"]]] = None,
+    ) -> None:
+        if values.ndim != 2 or values.shape[1] != len(metrics):
+            raise ValueError(f"Expected {len(metrics)} columns but got array of shape {values.shape}")
+        self.values = np.asfortranarray(values)
+        self.metrics = tuple(metrics)
+        self.providers = tuple(providers) if providers is not None else (None,) * len(metrics)
+        self.index = MetricIndex(self.metrics, self.providers)
+        self._run_metrics: Optional[List[Optional[RunMetric]]] = None
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def column(self, i: int) -> np.ndarray:
+        """Zero-copy view of column `i`"""
+        return self.values[:, i]
+
+    @property
+    def run_metrics(self) -> List[Optional[RunMetric]]:
+        """Per-activity copies of the metric descriptions with their value set to a column view"""
+        if self._run_metrics is None:
+            self._run_metrics = [
+                metric.model_copy(update={"value": self.column(i)}) if metric else None
+                for i, metric in enumerate(self.metrics)
+            ]
+        return self._run_metrics
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .activity_frame import ActivityFrame
+
+
+def _copy_on_write() -> bool:
+    # always on from pandas 3, opt-in before
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.options.mode.copy_on_write is True
+
+
+class FrameCache:
+    """
+    In-memory LRU cache of built activity dataframes with a memory budget.
+
+    Keys are `(activity_id, resample, local time offset, cache version)` tuples, so a frame
+    is rebuilt whenever the cached details of its activity change. The `ActivityFrame` the dataframe
+    was built from is kept with it, so a hit can restore `RunActivity.frame` without
+    loading the details again (it is shared, like the metric descriptions, and never written to).
+
+    With copy-on-write (pandas >= 3) frames go in and out as shallow copies, so a hit costs
+    no copy and changes made by the caller never reach the cache. Older pandas without
+    copy-on-write falls back to a deep copy on every `get` and `put`.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2) -> None:
+        self.max_bytes = max_bytes
+        # key -> (dataframe, activity frame, bytes)
+        self.frames: "OrderedDict[Hashable, Tuple[pd.DataFrame, Optional[ActivityFrame], int]]" = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _frame_nbytes(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def get(self, key: Hashable) -> Optional[Tuple[pd.DataFrame, Optional["ActivityFrame"]]]:
+        """Return a copy of the cached dataframe and its activity frame, or None on a miss"""
+        with self.lock:
+            if key not in self.frames:
+                self.misses += 1
+                return None
+            df, frame, _ = self.frames[key]
+            self.frames.move_to_end(key)
+            self.hits += 1
+        return df.copy(deep=not _copy_on_write()), frame
+
+    def put(self, key: Hashable, df: pd.DataFrame, frame: Optional["ActivityFrame"] = None) -> None:
+        nbytes = self._frame_nbytes(df) + (frame.nbytes if frame is not None else 0)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.frames:
+                self.nbytes -= self.frames.pop(key)[2]
+            self.frames[key] = (df.copy(deep=not _copy_on_write()), frame, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and self.frames:
+            _, (_, _, nbytes) = self.frames.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def invalidate(self, activity_id: Optional[str] = None) -> None:
+        """Drop the cached frames of an activity, or every frame if `activity_id` is None"""
+        with self.lock:
+            keys = [
+                key for key in self.frames
+                if activity_id is None or key[0] == activity_id
+            ]
+            for key in keys:
+                self.nbytes -= self.frames.pop(key)[2]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "frames": len(self.frames),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+FRAME_CACHE = FrameCache()
@@ -6,10 +6,13 @@ import pandas as pd
 from pydantic import BaseModel
 
 from ..client import BaseClient
-from ..data_field.utils import get_metric_provider
-from ..data_field import RunMetric
+from ..data_field import PROVIDER_REGISTRY, RunMetric
+from ..instrumentation import STATS
+from .activity_frame import ActivityFrame
+from .frame_cache import FRAME_CACHE
 
 
+@STATS.timed("garmin_resample")
 def garmin_resample(df: pd.DataFrame, target_freq: str = '1s', break_threshold: int = 10):
     """
     Custom resample function for time series with varying sample rates.
@@ -45,23 +48,15 @@ def garmin_resample(df: pd.DataFrame, target_freq: str = '1s', break_threshold:
     # Reindex the dataframe to include all timestamps
     resampled = df.reindex(full_range)
     
-    # Get original timestamps
-    original_timestamps = df.index
-    
     # Calculate the time difference between each timestamp and the nearest previous original timestamp
-    time_diffs = []
-    for idx in resampled.index:
-        # Find timestamps before current index
-        prev_timestamps = original_timestamps[original_timestamps <= idx]
-        if len(prev_timestamps) > 0:
-            # Calculate time difference with nearest previous timestamp
-            time_diff = (idx - prev_timestamps[-1]).total_seconds()
-            time_diffs.append(time_diff)
-        else:
-            time_diffs.append(0)  # For the first timestamp
-            
+    # using a binary search over the sorted original timestamps (O(m log n) instead of O(n*m))
+    original_timestamps = np.sort(df.index.values)
+    resampled_timestamps = resampled.index.values
+    prev_idx = np.searchsorted(original_timestamps, resampled_timestamps, side="right") - 1
+    time_diffs = (resampled_timestamps - original_timestamps[prev_idx]) / np.timedelta64(1, "s")
+
     # Create mask for breaks
-    break_mask = np.array(time_diffs) > break_threshold
+    break_mask = time_diffs > break_threshold
     
     # Fill breaks with zeros first
     resampled.loc[break_mask] = 0
@@ -72,15 +67,40 @@ def garmin_resample(df: pd.DataFrame, target_freq: str = '1s', break_threshold:
     return resampled.fillna(0.)
 
 
+def as_storage_dtype(values: np.ndarray, dtype: str) -> np.ndarray:
+    """
+    Cast a metric column to its storage dtype.
+
+    Integer dtypes are only used when every value is integral and fits in the dtype,
+    otherwise the column falls back to float32 (e.g. heart rate with missing samples).
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        fits = (
+            np.isfinite(values).all()
+            and (values >= info.min).all()
+            and (values <= info.max).all()
+            and (np.mod(values, 1) == 0).all()
+        )
+        if not fits:
+            dtype = np.dtype(np.float32)
+    return values.astype(dtype, copy=False)
+
+
 class RunActivity(BaseModel):
 
+    class Config:
+        arbitrary_types_allowed = True  # This allows ActivityFrame
+
     activity_id: str
     start_time: datetime
+    start_time_gmt: Optional[datetime] = None
     activity_name: Optional[str] = None
     timezone: Optional[str] = None
     calories: Optional[float] = None
     is_treadmill: bool = False
-    run_metrics: Optional[List[RunMetric]] = None
+    frame: Optional[ActivityFrame] = None
 
     @staticmethod
     def get_tz(start_local: str, start_gmt: str) -> str:
@@ -90,6 +110,10 @@ class RunActivity(BaseModel):
         sign = "+" if hour_diff > 0 else "-"
         return f"GMT{sign}{hour_diff}"
     
+    @property
+    def run_metrics(self) -> Optional[List[Optional[RunMetric]]]:
+        return self.frame.run_metrics if self.frame is not None else None
+
     @property
     def url(self) -> str:
         return f"https://connect.garmin.com/modern/activity/{self.activity_id}"
@@ -100,52 +124,88 @@ class RunActivity(BaseModel):
         return cls(
             activity_id=str(activity["activityId"]),
             start_time=activity["startTimeLocal"],
+            start_time_gmt=activity["startTimeGMT"],
             activity_name=activity["activityName"],
             timezone=tz,
             calories=activity["calories"],
             is_treadmill=activity["activityType"]["typeKey"] == "treadmill_running"
         )
     
+    @STATS.timed("load_details")
     def load_details(self, client: BaseClient) -> None:
-        details = client.get_activity_details(self.activity_id)
-        run_metrics = []
-        metric_array = np.array([t["metrics"] for t in details["activityDetailMetrics"]])
-
-        for i, metric in enumerate(details["metricDescriptors"]):
-            provider = get_metric_provider(metric)
-            run_metric = provider.get_metric_from_dict(metric)
-            if run_metric:
-                run_metric.set_value(metric_array[:, i])
-
-            run_metrics.append(run_metric)
+        metric_descriptors, metric_array = client.get_activity_arrays(self.activity_id)
+        self.frame = ActivityFrame(
+            metric_array,
+            PROVIDER_REGISTRY.resolve(metric_descriptors),
+            PROVIDER_REGISTRY.resolve_providers(metric_descriptors),
+        )
 
-        self.run_metrics = run_metrics
+    @STATS.timed("to_df")
+    def to_df(
+        self, 
+        client: BaseClient, 
+        resample: Optional[str] = None, 
+        use_cache: bool = True
+    ) -> pd.DataFrame:
+        """
+        Build the dataframe of the run, optionally resampled.
+
+        Every column is stored in the `dtype` declared by its metric. Without resampling,
+        integer columns with missing samples fall back to float32, resampled frames have no
+        gaps so their integer columns always get the declared dtype. The index holds the
+        local time of the activity (naive, shifted by `start_time - start_time_gmt`) or UTC
+        when the GMT start time is unknown.
+
+        Frames are memoized in `FRAME_CACHE` per activity, resample frequency, local time offset
+        and cache file version. A memoized frame is returned without loading the details again, `frame`
+        is set to the `ActivityFrame` it was built from.
+        """
+        # the index depends on the local time offset, not only on the details
+        offset = None if self.start_time_gmt is None else self.start_time - self.start_time_gmt
+        version = client.get_details_version(self.activity_id) if use_cache else None
+        if version is not None:
+            cached = FRAME_CACHE.get((self.activity_id, resample, offset, version))
+            if cached is not None:
+                STATS.count("frame_cache.hit")
+                df, self.frame = cached
+                return df
+            STATS.count("frame_cache.miss")
 
-    def to_df(self, client: BaseClient, resample: Optional[str] = None) -> pd.DataFrame:
         self.load_details(client)
 
-        columns = []
-        data = []
-        for metric in self.run_metrics:
+        timestamps = None
+        data = {}
+        dtypes = {}
+        for i, metric in enumerate(self.frame.metrics):
             if metric is None:
                 continue
 
+            if metric.name == "Timestamp":
+                timestamps = self.frame.column(i)
+                continue
             # custom power column for garmin/stryd power
             # since both use the same name
-            if metric.name == "Power":
-                columns.append(f"Power - {metric.app_name}")
-            else:
-                columns.append(metric.name)
-            data.append(metric.value)
-        data = np.stack(data).T
-        df = pd.DataFrame(data, columns=columns)
+            name = f"Power - {metric.app_name}" if metric.name == "Power" else metric.name
+            data[name] = as_storage_dtype(self.frame.column(i), metric.dtype)
+            dtypes[name] = metric.dtype
 
-        df["Timestamp"] = df["Timestamp"].map(lambda x: datetime.fromtimestamp(x/1000))
-        df = df.set_index("Timestamp")
+        # milli epoch to datetime64 without going through python datetimes
+        index = timestamps.astype(np.int64).astype("datetime64[ms]").astype("datetime64[ns]")
+        if offset is not None:
+            index = index + np.timedelta64(offset)
+        df = pd.DataFrame(data, index=pd.DatetimeIndex(index, name="Timestamp"))
 
         if resample:
+            # breaks and gaps are filled, so integer columns get their declared dtype back even
+            # when the raw stream had missing samples
             df = garmin_resample(df, resample)
+            df = pd.DataFrame(
+                {name: as_storage_dtype(df[name].to_numpy(), dtypes[name]) for name in df.columns},
+                index=df.index,
+            )
+
+        # details may have just been fetched into the cache
+        version = client.get_details_version(self.activity_id) if use_cache else None
+        if version is not None:
+            FRAME_CACHE.put((self.activity_id, resample, offset, version), df, self.frame)
         return df
-
-        
-        
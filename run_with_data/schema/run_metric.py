@@ -1,41 +1,86 @@
-from typing import Any, Sequence, Optional, Literal
+from typing import Any, Sequence, Optional, Literal, Tuple
 
-import matplotlib.pyplot as plt
 import numpy as np
 from pydantic import BaseModel, field_validator
 
 
+METERS_PER_UNIT = {
+    "km": 1000.,
+    "mi": 1609.344,
+}
+
+
 def ms_to_pace(speed_ms: float, unit: Literal["km", "mi"] = "km") -> Optional[str]:
     """
-    Convert speed in meters/second to pace in min/km format
+    Convert speed in meters/second to pace in min/km (or min/mi) format
     
     Args:
         speed_ms (float): Speed in meters per second
+        unit (str): Distance unit, "km" or "mi"
     
     Returns:
         str: Pace in format "MM:SS min/km"
     """
+    if unit not in METERS_PER_UNIT:
+        raise ValueError(f"Invalid unit: {unit}")
+
     if speed_ms <= 0:
         return None
     
-    # Calculate minutes per kilometer
+    # Calculate minutes per unit
     # 1 km = 1000m, so time for 1km = 1000/speed
     # Convert seconds to minutes by dividing by 60
-    minutes_per_km = (1000 / speed_ms) / 60
+    minutes_per_unit = (METERS_PER_UNIT[unit] / speed_ms) / 60
     
     # Split into whole minutes and remaining seconds
-    whole_minutes = int(minutes_per_km)
-    seconds = int((minutes_per_km - whole_minutes) * 60)
+    whole_minutes = int(minutes_per_unit)
+    seconds = int((minutes_per_unit - whole_minutes) * 60)
 
-    whole_minutes*60
-    
-    if unit == "km":
-        return f"{whole_minutes}:{seconds:02d} min/km"
-    elif unit == "mi":
-        return f"{whole_minutes}:{seconds:02d} min/mi"
-    else:
+    return f"{whole_minutes}:{seconds:02d} min/{unit}"
+
+
+def mps_to_pace(speed_mps: np.ndarray, unit: Literal["km", "mi"] = "km") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert speeds in meters/second to pace minutes and seconds, same rounding as `ms_to_pace`
+
+    Args:
+        speed_mps (np.ndarray): Speeds in meters per second
+        unit (str): Distance unit, "km" or "mi"
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Whole minutes and seconds per unit as int64 arrays,
+            both 0 where the speed is not positive (or NaN)
+    """
+    if unit not in METERS_PER_UNIT:
         raise ValueError(f"Invalid unit: {unit}")
 
+    speed_mps = np.asarray(speed_mps, dtype=np.float64)
+    valid = speed_mps > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        minutes_per_unit = np.where(valid, (METERS_PER_UNIT[unit] / speed_mps) / 60, 0.)
+
+    whole_minutes = np.trunc(minutes_per_unit)
+    seconds = np.trunc((minutes_per_unit - whole_minutes) * 60)
+    return whole_minutes.astype(np.int64), seconds.astype(np.int64)
+
+
+def format_pace(minutes: np.ndarray, seconds: np.ndarray, unit: Literal["km", "mi"] = "km") -> np.ndarray:
+    """
+    Format pace arrays from `mps_to_pace` as "MM:SS min/km" strings
+
+    Only the distinct paces are formatted in Python, every sample then picks its string.
+
+    Returns:
+        np.ndarray: Object array of pace strings, None where both minutes and seconds are 0
+    """
+    total_seconds = np.asarray(minutes, dtype=np.int64) * 60 + np.asarray(seconds, dtype=np.int64)
+    distinct, inverse = np.unique(total_seconds, return_inverse=True)
+    paces = np.array(
+        [f"{_s // 60}:{_s % 60:02d} min/{unit}" if _s != 0 else None for _s in distinct.tolist()],
+        dtype=object
+    )
+    return paces[inverse.reshape(total_seconds.shape)]
+
 
 class PaceMinPerKm(BaseModel):
     minute: int
@@ -48,11 +93,9 @@ class PaceMinPerKm(BaseModel):
 
     @classmethod
     def from_mps(cls, mps: float) -> "PaceMinPerKm":
-        pace = ms_to_pace(mps, unit="km")
-        if pace is None:
+        if not mps > 0:
             return cls(minute=0, second=0)
-        pace = pace.split()[0]
-        minute, second = pace.split(":")
+        minute, second = mps_to_pace(mps, unit="km")
         return cls(minute=int(minute), second=int(second), mps=mps)
     
     def to_mps(self) -> float:
@@ -88,6 +131,7 @@ class RunMetric(BaseModel):
     developer_field_number: Optional[int] = None
     value: Optional[np.ndarray] = None
     app_name: str = "Garmin" # default field value from garmin
+    dtype: str = "float32" # storage dtype of the dataframe column
 
     class Config:
         arbitrary_types_allowed = True  # This allows numpy arrays
@@ -120,6 +164,8 @@ class RunMetric(BaseModel):
         self.value = value
 
     def plot(self, x: Optional[Sequence[Any]] = None) -> None:
+        import matplotlib.pyplot as plt
+
         if self.value is not None:
             if x:
                 if len(x) != len(self.value):
@@ -1,8 +1,6 @@
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import matplotlib.font_manager as fm
 from pathlib import Path
-import os
+
+from cycler import cycler
 
 # Get the current file's directory
 CURRENT_DIR = Path(__file__).parent
@@ -10,10 +8,20 @@ CURRENT_DIR = Path(__file__).parent
 # Add font files from the font directory
 FONT_DIR = CURRENT_DIR / 'font'
 
-# Register all font files in the font directory
-font_files = FONT_DIR.glob('*.ttf')
-for font_path in font_files:
-    fm.fontManager.addfont(str(font_path))
+_fonts_registered = False
+
+
+def register_fonts():
+    """Register all font files in the font directory with matplotlib (only once)."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    import matplotlib.font_manager as fm
+
+    for font_path in FONT_DIR.glob('*.ttf'):
+        fm.fontManager.addfont(str(font_path))
+    _fonts_registered = True
+
 
 # Define your brand colors
 BACKGROUND_COLOR = '#000000'
@@ -53,7 +61,7 @@ brand_style = {
     'ytick.color': AXIS_COLOR,
     
     # Default colors for plotting
-    'axes.prop_cycle': mpl.cycler('color', [PRIMARY_COLOR, SECONDARY_COLOR]),
+    'axes.prop_cycle': cycler('color', [PRIMARY_COLOR, SECONDARY_COLOR]),
     
     # Text properties
     'text.color': AXIS_COLOR,
@@ -75,6 +83,9 @@ brand_style = {
 
 def apply_brand_style():
     """Apply the custom brand style to matplotlib."""
+    import matplotlib.pyplot as plt
+
+    register_fonts()
     plt.style.use('dark_background')  # Start with dark theme as base
     plt.rcParams.update(brand_style)  # Apply custom brand style
     
\ No newline at end of file
@@ -1,49 +1,103 @@
-from typing import Dict, Literal, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+from .instrumentation import STATS
 from .schema.run_activity import RunActivity
 
 
+def segment_bounds(speed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the moving segments of a speed array.
+
+    A sample is a break if its speed is NaN, or if it is zero next to another zero.
+    Segments are the maximal runs of samples that are not breaks.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Start (inclusive) and end (exclusive) row of every segment
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    zero = speed == 0
+    prev_zero = np.zeros_like(zero)
+    prev_zero[1:] = zero[:-1]
+    next_zero = np.zeros_like(zero)
+    next_zero[:-1] = zero[1:]
+
+    keep = ~(zero & (prev_zero | next_zero)) & ~np.isnan(speed)
+    edges = np.diff(np.concatenate([[False], keep, [False]]).astype(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def find_segments(
+    df: pd.DataFrame,
+    min_duration: Optional[float] = None,
+    max_duration: Optional[float] = None,
+    min_mean: Optional[Dict[str, float]] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Find the moving segments of a run without materializing them.
+
+    Args:
+        df (pd.DataFrame): Run dataframe with a datetime index and a "Speed" column
+        min_duration (Optional[float]): Minimum segment duration in seconds
+        max_duration (Optional[float]): Maximum segment duration in seconds
+        min_mean (Optional[Dict[str, float]]): Minimum mean value of columns over the segment,
+            e.g. `{"Heart Rate": 165}`
+
+    Returns:
+        List[Tuple[int, int]]: `(start, end)` row ranges of the segments passing every filter,
+            use `df.iloc[start:end]` to get a segment
+    """
+    starts, ends = segment_bounds(df["Speed"].to_numpy())
+    keep = np.ones(len(starts), dtype=bool)
+
+    if min_duration is not None or max_duration is not None:
+        timestamps = df.index.values
+        durations = (timestamps[ends - 1] - timestamps[starts]) / np.timedelta64(1, "s")
+        if min_duration is not None:
+            keep &= durations >= min_duration
+        if max_duration is not None:
+            keep &= durations <= max_duration
+
+    for column, threshold in (min_mean or {}).items():
+        # segment means from cumulative sums, ignoring NaN like pandas
+        values = df[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.concatenate([[0.], np.cumsum(np.where(valid, values, 0.))])
+        counts = np.concatenate([[0], np.cumsum(valid)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (sums[ends] - sums[starts]) / (counts[ends] - counts[starts])
+        keep &= means >= threshold
+
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+@STATS.timed("split_df")
 def split_df(df: pd.DataFrame, min_break = 10):
-    """Source: https://stackoverflow.com/questions/63959471/split-a-dataframe-by-rows-containing-zero-in-python-pandas"""
-    df2 = df.mask((df['Speed'] == 0) & ((df['Speed'].shift(1) == 0) | (df['Speed'].shift(-1) == 0)))
-    df2['group'] = (df2['Speed'].shift(1).isnull() & df2['Speed'].notnull()).cumsum()
-    splits = [x[1] for x in list(df2[df2['Speed'].notnull()].groupby('group'))]
-    return splits
+    """
+    Split a run into its moving segments, see `find_segments` to filter segments without copying them.
+
+    Source: https://stackoverflow.com/questions/63959471/split-a-dataframe-by-rows-containing-zero-in-python-pandas
+    """
+    starts, ends = segment_bounds(df["Speed"].to_numpy())
+    return [
+        df.iloc[start:end].assign(group=group)
+        for group, (start, end) in enumerate(zip(starts, ends), start=1)
+    ]
 
 
 def get_power_indices(activity: RunActivity, include_timestamp: bool = True) -> Dict[Literal["stryd", "garmin", "runpowermodel", "time"], int]:
     """Get index of metric from the run"""
+    index = activity.frame.index
     output = {
-        "stryd": None,
-        "garmin": None,
-        "runpowermodel": None,
+        "stryd": index.get_power("stryd"),
+        "garmin": index.get_power("garmin"),
+        "runpowermodel": index.get_power("runpowermodel"),
     }
     if include_timestamp:
-        output["timestamp"] = None
-    for i, _metric in enumerate(activity.run_metrics):
-        if _metric is None:
-            continue
-        if all(_v is not None for _v in output.values()):
-            break
-        if _metric.name.lower() in ["power", "running power"]:
-            if "stryd" in _metric.app_name.lower():
-                output["stryd"] = i
-            elif "runpowermodel" in _metric.app_name.lower():
-                output["runpowermodel"] = i
-            else:
-                assert "garmin" in _metric.app_name.lower()
-                output["garmin"] = i
-
-        if _metric.name.lower() == "timestamp":
-            output["timestamp"] = i
+        output["timestamp"] = index.get("timestamp")
     return output
 
 
 def get_metric_index(activity: RunActivity, keyword: str) -> Optional[int]:
-    for i, _metric in enumerate(activity.run_metrics):
-        if _metric is None:
-            continue
-        if _metric.name.lower() == keyword.lower():
-            return i
-        
\ No newline at end of file
+    return activity.frame.index.get(keyword)
@@ -0,0 +1,313 @@
+import json
+import os
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .client import BaseClient
+from .client.cache import atomic_write
+from .schema.run_activity import RunActivity
+
+
+ZONE_STATS = ("min", "max", "mean")
+
+
+def chunk_stats(values: np.ndarray, chunk_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Min, max and mean of consecutive chunks of `chunk_rows` rows, ignoring NaN
+
+    The last chunk may be shorter. Chunks without any value are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_chunks = -(-len(values) // chunk_rows)
+    padded = np.full(n_chunks * chunk_rows, np.nan)
+    padded[:len(values)] = values
+    chunks = padded.reshape(n_chunks, chunk_rows)
+    with warnings.catch_warnings():
+        # all-NaN chunks
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmin(chunks, axis=1), np.nanmax(chunks, axis=1), np.nanmean(chunks, axis=1)
+
+
+def _to_float32(values: np.ndarray, direction: float) -> np.ndarray:
+    """Round to float32 towards `direction` (-inf or inf), so stored bounds stay bounds"""
+    rounded = values.astype(np.float32)
+    inexact = rounded < values if direction > 0 else rounded > values
+    return np.where(inexact, np.nextafter(rounded, np.float32(direction)), rounded)
+
+
+def _pad_columns(array: np.ndarray, width: int) -> np.ndarray:
+    return np.hstack([array, np.full((len(array), width - array.shape[1]), np.nan, dtype=np.float32)])
+
+
+class ZoneMapIndex:
+    """
+    Summary index of 1 Hz activity dataframes, persisted next to the detail cache.
+
+    Every activity is split into chunks of `chunk_seconds` and the min, max and mean of
+    each column are stored per chunk, along with the duration, columns, data providers and
+    power sources of the activity. `candidates` uses them to rule out activities that can't
+    satisfy a predicate without opening their details. Pruning is conservative: activities
+    that are kept may still fail the predicate, but no matching activity is ever dropped.
+
+    The index is filled at ingest when passed as `zone_maps` to `GarminClient.prefetch_details`,
+    `import_fit_files` or `CorpusStore`. Activities ingested otherwise are only indexed by
+    calling `update`, `candidates` keeps activities it doesn't know about.
+    """
+
+    def __init__(self, cache_dir: str = "~/.cache/garmin_activities", chunk_seconds: int = 300) -> None:
+        self.index_dir = os.path.join(os.path.expanduser(cache_dir), "zone_maps")
+        Path(self.index_dir).mkdir(parents=True, exist_ok=True)
+        self.index_path = os.path.join(self.index_dir, "index.json")
+        self.chunks_path = os.path.join(self.index_dir, "chunks.npz")
+
+        self.chunk_seconds = chunk_seconds
+        # activity id -> {"start_time", "duration", "columns", "providers", "power_sources", "first_chunk", "n_chunks"}
+        self.activities: Dict[str, Dict] = {}
+        self.columns: List[str] = []
+        # (n_chunks, n_columns) arrays per statistic and the number of rows of every chunk
+        self.chunks = {stat: np.empty((0, 0), dtype=np.float32) for stat in ZONE_STATS}
+        self.chunk_lengths = np.empty(0, dtype=np.int32)
+        # chunks of added activities, merged into `chunks` on first use
+        self._pending: List[Tuple[Dict[str, np.ndarray], np.ndarray]] = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index["chunk_seconds"] != chunk_seconds:
+                raise ValueError(
+                    f"Zone maps in {self.index_dir} use {index['chunk_seconds']}s chunks, not {chunk_seconds}s"
+                )
+            self.activities = index["activities"]
+            self.columns = index["columns"]
+            with np.load(self.chunks_path, allow_pickle=False) as data:
+                self.chunks = {stat: data[stat] for stat in ZONE_STATS}
+                self.chunk_lengths = data["lengths"]
+        self.n_chunks = len(self.chunk_lengths)
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def __contains__(self, activity_id: str) -> bool:
+        return activity_id in self.activities
+
+    def _merge_pending(self) -> None:
+        if not self._pending:
+            return
+        width = len(self.columns)
+        self.chunks = {
+            stat: np.vstack([_pad_columns(self.chunks[stat], width)] + [
+                _pad_columns(block[stat], width) for block, _ in self._pending
+            ])
+            for stat in ZONE_STATS
+        }
+        self.chunk_lengths = np.concatenate([self.chunk_lengths] + [lengths for _, lengths in self._pending])
+        self._pending = []
+
+    def add(
+        self,
+        activity_id: str,
+        df: pd.DataFrame,
+        start_time: Optional[datetime] = None,
+        providers: Sequence[str] = (),
+        power_sources: Sequence[str] = (),
+        save: bool = True,
+    ) -> None:
+        """
+        Add (or replace) the zone maps of an activity
+
+        Args:
+            activity_id (str): Activity id
+            df (pd.DataFrame): Dataframe of the activity resampled at 1 second
+            start_time (Optional[datetime]): Start time of the activity
+            providers (Sequence[str]): Names of the data providers recorded in the activity
+            power_sources (Sequence[str]): Power sources of the activity ("stryd", "garmin", ...)
+            save (bool): Write the index, set to False when adding many activities then call `save`
+        """
+        for name in df.columns:
+            if name not in self.columns:
+                self.columns.append(name)
+        n_chunks = -(-len(df) // self.chunk_seconds)
+        block = {stat: np.full((n_chunks, len(self.columns)), np.nan, dtype=np.float32) for stat in ZONE_STATS}
+        for name in df.columns:
+            mins, maxs, means = chunk_stats(df[name].to_numpy(dtype=np.float64, na_value=np.nan), self.chunk_seconds)
+            i = self.columns.index(name)
+            block["min"][:, i] = _to_float32(mins, -np.inf)
+            block["max"][:, i] = _to_float32(maxs, np.inf)
+            block["mean"][:, i] = means
+        lengths = np.full(n_chunks, self.chunk_seconds, dtype=np.int32)
+        if n_chunks:
+            lengths[-1] = len(df) - (n_chunks - 1) * self.chunk_seconds
+
+        # replaced activities leave their old chunks unused
+        self.activities[activity_id] = {
+            "start_time": start_time.isoformat() if start_time else None,
+            "duration": len(df),
+            "columns": list(df.columns),
+            "providers": list(providers),
+            "power_sources": list(power_sources),
+            "first_chunk": self.n_chunks,
+            "n_chunks": n_chunks,
+        }
+        self._pending.append((block, lengths))
+        self.n_chunks += n_chunks
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        self._merge_pending()
+        data = json.dumps({
+            "chunk_seconds": self.chunk_seconds,
+            "columns": self.columns,
+            "activities": self.activities,
+        })
+        atomic_write(self.chunks_path, lambda f: np.savez(f, lengths=self.chunk_lengths, **self.chunks))
+        atomic_write(self.index_path, lambda f: f.write(data.encode()))
+
+    def add_activity(self, activity: RunActivity, df: pd.DataFrame, save: bool = True) -> None:
+        """Add the zone maps of an activity with loaded details, from its 1 Hz dataframe"""
+        providers = sorted({_p.name for _p in activity.frame.providers if _p is not None})
+        self.add(
+            activity.activity_id, df, activity.start_time, providers,
+            activity.frame.index.power_sources, save=save
+        )
+
+    def update(self, activities: List[RunActivity], client: BaseClient) -> int:
+        """
+        Add the zone maps of activities that are not indexed yet
+
+        Returns:
+            int: Number of added activities
+        """
+        added = 0
+        for activity in activities:
+            if activity.activity_id in self:
+                continue
+            self.add_activity(activity, activity.to_df(client, resample="1s", use_cache=False), save=False)
+            added += 1
+        if added:
+            self.save()
+        return added
+
+    def stats(self, activity_id: str) -> Dict[str, Tuple[float, float, float]]:
+        """Min, max and mean of every column of an activity"""
+        self._merge_pending()
+        activity = self.activities[activity_id]
+        rows = slice(activity["first_chunk"], activity["first_chunk"] + activity["n_chunks"])
+        lengths = self.chunk_lengths[rows]
+        output = {}
+        for name in activity["columns"]:
+            i = self.columns.index(name)
+            mins, maxs, means = (self.chunks[stat][rows, i] for stat in ZONE_STATS)
+            valid = ~np.isnan(means)
+            if not valid.any():
+                output[name] = (np.nan, np.nan, np.nan)
+                continue
+            mean = np.average(means[valid], weights=lengths[valid])
+            output[name] = (float(np.nanmin(mins)), float(np.nanmax(maxs)), float(mean))
+        return output
+
+    def max_sustained_mean(self, activity_id: str, column: str, seconds: int) -> float:
+        """
+        Upper bound of the best `seconds`-long rolling mean of a column, from the chunk maxima
+
+        A window covers the end of a chunk, `n` whole chunks and the start of another chunk.
+        Its sum is at most the sum of `length * max` over the whole chunks plus the rest of the
+        window times the larger max of the two partial chunks. The bound is the largest such
+        sum over every chunk and every possible `n`, divided by `seconds`. NaN (no window) if
+        the activity is shorter than `seconds` or doesn't have the column.
+        """
+        activity = self.activities[activity_id]
+        if column not in activity["columns"] or activity["duration"] < seconds:
+            return np.nan
+        self._merge_pending()
+        rows = slice(activity["first_chunk"], activity["first_chunk"] + activity["n_chunks"])
+        # NaN chunks around the activity stand for the edges of windows starting or ending with it
+        maxs = np.concatenate([[np.nan], self.chunks["max"][rows, self.columns.index(column)], [np.nan]])
+        lengths = np.concatenate([[0], self.chunk_lengths[rows], [0]]).astype(np.float64)
+
+        # prefix sums over chunks, so whole chunks [a, b) sum to `x[b] - x[a]`
+        weighted = np.concatenate([[0.], np.cumsum(np.nan_to_num(lengths * maxs))])
+        n_missing = np.concatenate([[0], np.cumsum(np.isnan(maxs))])
+        covered = np.concatenate([[0.], np.cumsum(lengths)])
+
+        bound = -np.inf
+        n_whole = seconds // self.chunk_seconds
+        for n in range(max(n_whole - 1, 0), n_whole + 2):
+            # window starting in chunk i, covering chunks i + 1 to i + n whole, ending in chunk i + n + 1
+            i = np.arange(len(maxs) - n - 1)
+            whole_sum = weighted[i + n + 1] - weighted[i + 1]
+            whole_missing = n_missing[i + n + 1] - n_missing[i + 1]
+            rest = seconds - (covered[i + n + 1] - covered[i + 1])
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                edge = np.fmax(maxs[i], maxs[i + n + 1])
+            partial = np.where(rest > 0, rest * edge, 0.)
+            valid = (whole_missing == 0) & (rest >= 0) & ~np.isnan(partial)
+            if valid.any():
+                bound = max(bound, float(((whole_sum + partial)[valid]).max()) / seconds)
+        return bound if np.isfinite(bound) else np.nan
+
+    def candidates(
+        self,
+        activity_ids: Optional[Sequence[str]] = None,
+        columns: Sequence[str] = (),
+        providers: Sequence[str] = (),
+        power_sources: Sequence[str] = (),
+        min_duration: Optional[int] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        sustained: Optional[Dict[str, Tuple[float, int]]] = None,
+    ) -> List[str]:
+        """
+        Return the activities that may satisfy every predicate
+
+        Args:
+            activity_ids (Optional[Sequence[str]]): Activities to screen, all indexed activities by default.
+                Activities missing from the index are always kept.
+            columns (Sequence[str]): Columns the activity must have (e.g. "Power - Garmin")
+            providers (Sequence[str]): Data providers the activity must have (e.g. "StrydZones - Running Power Zones")
+            power_sources (Sequence[str]): Power sources the activity must have (e.g. "stryd")
+            min_duration (Optional[int]): Minimum duration in seconds
+            ranges (Optional[Dict[str, Tuple[Optional[float], Optional[float]]]]): Column to `(low, high)`,
+                the column must reach a value within the range (None for an open bound)
+            sustained (Optional[Dict[str, Tuple[float, int]]]): Column to `(threshold, seconds)`, the rolling
+                mean of the column over `seconds` must reach `threshold` (e.g. 165 bpm for 30 minutes)
+
+        Returns:
+            List[str]: Activity ids that can't be ruled out, in the order of `activity_ids`
+        """
+        activity_ids = list(self.activities) if activity_ids is None else activity_ids
+        output = []
+        for activity_id in activity_ids:
+            activity = self.activities.get(activity_id)
+            if activity is None:
+                output.append(activity_id)
+                continue
+            if not set(columns) <= set(activity["columns"]):
+                continue
+            if not set(providers) <= set(activity["providers"]):
+                continue
+            if not set(power_sources) <= set(activity["power_sources"]):
+                continue
+            if min_duration is not None and activity["duration"] < min_duration:
+                continue
+
+            stats = self.stats(activity_id) if ranges else {}
+            if any(
+                name not in stats
+                or (low is not None and not stats[name][1] >= low)
+                or (high is not None and not stats[name][0] <= high)
+                for name, (low, high) in (ranges or {}).items()
+            ):
+                continue
+
+            if any(
+                not self.max_sustained_mean(activity_id, name, seconds) >= threshold
+                for name, (threshold, seconds) in (sustained or {}).items()
+            ):
+                continue
+            output.append(activity_id)
+        return output